@@ -1,10 +1,21 @@
 import logging
-import re
 import os
-import io
-import pypdf
+import re
+import hashlib
+import threading
+from types import SimpleNamespace
 from flask import current_app
 from dotenv import load_dotenv
+from resume_extractor import ResumeExtractor, ResumeExtractionError, SpooledUpload
+from result_cache import ResultCache
+from topic_matcher import TopicMatcher
+from retrieval import RetrievalEngine
+from conversation_memory import ConversationStore, InProcessSessionBackend, SQLiteSessionBackend
+from single_flight import SingleFlight
+from job_queue import PermanentJobError
+import intent_router
+from text_utils import estimate_tokens, html_to_text, make_snippet
+from metrics import timed, stage, count_error, count_cache, LLM_REQUESTS, LLM_TOKENS, ADVISOR_INTENTS
 
 # Load environment variables
 load_dotenv()
@@ -13,40 +24,137 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('ai_advisor')
 
-try:
-    from google import genai
-    from google.genai import types
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("Google GenAI not installed. Run: pip install google-genai")
+# google-genai is the slowest import in the app (~0.5s) and only the LLM
+# paths need it, so it is imported on first use by _import_genai()
+genai = None
+types = None
+
+
+def _import_genai():
+    """Import the Gemini SDK once; False if it is not installed"""
+    global genai, types
+    if genai is None:
+        try:
+            from google import genai as genai_sdk
+            from google.genai import types as genai_types
+        except ImportError:
+            logger.warning("Google GenAI not installed. Run: pip install google-genai")
+            return False
+        genai, types = genai_sdk, genai_types
+    return True
+
 
 class AIAdvisor:
     def __init__(self, app=None):
         self.app = app
         self.db = None
         self.Course = None
-        self.client = None
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
         self.model_id = "gemini-2.5-flash" 
-        
-        api_key = os.getenv('GOOGLE_API_KEY')
-        if GEMINI_AVAILABLE and api_key:
-            try:
-                self.client = genai.Client(api_key=api_key)
-                logger.info(f"🚀 Gemini {self.model_id} online")
-            except Exception as e:
-                logger.error(f"Failed to init Gemini: {e}")
-                self.client = None
+        self.extractor = ResumeExtractor()
+        self.resume_cache = ResultCache()
+        self.catalog = 'txst-cs'
+        self.catalog_version = None
+        self.topic_matcher = TopicMatcher()
+        self.retriever = RetrievalEngine()
+        self.journey_map = None
+        self.memory = ConversationStore()
+        self.context_tokens = 400
+        self.flights = SingleFlight()
+        self.flight_timeout = 30
 
         if app is not None:
             self.init_app(app)
 
+    @property
+    def client(self):
+        """Gemini client, created on first use in each process.
+
+        Keeps the SDK import off the boot path, and keeps the client's HTTP
+        connections out of a preloading gunicorn master (see gunicorn.conf.py).
+        """
+        if self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client_pid != os.getpid():
+                    self._client = self._create_client()
+                    self._client_pid = os.getpid()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+        self._client_pid = os.getpid()
+
+    def _create_client(self):
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if not api_key or not _import_genai():
+            return None
+        try:
+            client = genai.Client(api_key=api_key)
+            logger.info(f"🚀 Gemini {self.model_id} online")
+            return client
+        except Exception as e:
+            logger.error(f"Failed to init Gemini: {e}")
+            return None
+
     def init_app(self, app):
         self.app = app
         from extensions import db
         from models import Course
         self.db = db
         self.Course = Course
+        self.extractor.init_app(app)
+        self.resume_cache = ResultCache(
+            max_entries=app.config.get('RESUME_CACHE_SIZE', 256),
+            ttl=app.config.get('RESUME_CACHE_TTL', 86400),
+            directory=app.config.get('RESUME_CACHE_DIR')
+        )
+        self.memory = self._create_memory(app.config)
+        self.catalog = app.config.get('DEFAULT_CATALOG', self.catalog)
+        self.context_tokens = app.config.get('PROMPT_CONTEXT_TOKENS', self.context_tokens)
+        self.flights = SingleFlight(
+            lock_dir=app.config.get('SINGLE_FLIGHT_DIR'),
+            result_ttl=app.config.get('SINGLE_FLIGHT_RESULT_TTL', 2.0)
+        )
+        self.flight_timeout = app.config.get('SINGLE_FLIGHT_TIMEOUT', self.flight_timeout)
+        self.refresh_catalog_version()
+        self.build_topic_matcher()
+
+    def _create_memory(self, config):
+        max_users = config.get('CHAT_MAX_USERS', 1000)
+        backend = config.get('CHAT_SESSION_BACKEND', 'memory')
+        if backend == 'sqlite':
+            backend = SQLiteSessionBackend(config['CHAT_SESSION_DB'], max_users=max_users)
+        elif backend == 'memory':
+            backend = InProcessSessionBackend(max_users=max_users)
+        # Anything else is taken to be a backend object with load/save/delete
+        return ConversationStore(
+            backend=backend,
+            max_turns=config.get('CHAT_MAX_TURNS', 6),
+            idle_ttl=config.get('CHAT_IDLE_TTL', 1800),
+            token_budget=config.get('CHAT_HISTORY_TOKENS', 600)
+        )
+
+    def build_topic_matcher(self):
+        """Compile the topic vocabulary from the current catalog"""
+        try:
+            with self.app.app_context():
+                self.topic_matcher.build(self.Course.query.filter_by(catalog=self.catalog).all())
+        except Exception as e:
+            logger.error(f"Failed to build topic matcher: {e}")
+
+    def refresh_catalog_version(self):
+        """Re-fingerprint the catalog so cached analyses of old data are ignored"""
+        from models import compute_catalog_version
+        try:
+            with self.app.app_context():
+                self.catalog_version = compute_catalog_version(self.catalog)
+        except Exception as e:
+            logger.error(f"Failed to fingerprint catalog: {e}")
+            self.catalog_version = None
+        return self.catalog_version
 
     def analyze_resume(self, file_storage):
         """RAG-powered resume audit grounded in the local course database"""
@@ -54,122 +162,351 @@ class AIAdvisor:
             return "Resume analysis is currently offline."
 
         try:
-            # 1. Extract text from the PDF
-            pdf_reader = pypdf.PdfReader(io.BytesIO(file_storage.read()))
-            resume_text = ""
-            for page in pdf_reader.pages:
-                resume_text += page.extract_text() or ""
-
-            if len(resume_text.strip()) < 50:
-                return "I couldn't find enough text in that file. Please upload a digital PDF."
-
-            # 2. RETRIEVAL: Find REAL TXST courses based on resume content
-            # We search the database for courses related to what's in the resume
-            resume_topics = self._extract_topics(resume_text)
-            relevant_db_courses = []
-            if resume_topics:
-                # Search for keywords from the resume to find relevant TXST courses
-                for topic in resume_topics[:5]:
-                    matches = self._find_course_by_topic(topic, limit=2)
-                    relevant_db_courses.extend([f"{c.name}: {c.description}" for c in matches])
-            
-            # Format the "Truth" context for the AI
-            valid_course_context = "\n".join(list(set(relevant_db_courses))) if relevant_db_courses else "Consult the TXST CS catalog."
-
-            # 3. GROUNDED PROMPT (Persona: Encouraging Advisor)
-            prompt = f"""
-            ACT AS: A supportive and encouraging Texas State University CS Academic Advisor.
-            TASK: Provide a constructive audit of the student's resume and recommend REAL courses.
-            
-            ---
-            VALID TEXAS STATE COURSES (ONLY RECOMMEND FROM THIS LIST):
-            {valid_course_context}
-            ---
-            STUDENT RESUME TEXT:
-            {resume_text}
-            ---
-            STRICT RULES:
-            1. NEVER make up a course number. ONLY recommend courses from the 'VALID TEXAS STATE COURSES' list above.
-            2. If the document is NOT a resume, politely explain what a professional CS resume should include.
-            3. Tone: Be positive, encouraging, and helpful. Start with a compliment about their existing skills.
-            4. Identify 2 specific technical areas for growth and recommend 2 courses from the provided list to help.
-            5. FORMAT: Use plain text only. NO bolding (**), NO italics, NO markdown.
-            6. Keep the response under 150 words.
-            """
-
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                contents=prompt
-            )
-            
-            # Clean up any residual markdown formatting
-            return response.text.strip().replace("**", "").replace("__", "")
+            upload = self.extractor.spool(file_storage)
+        except ResumeExtractionError as e:
+            return str(e)
 
-        except Exception as e:
-            logger.error(f"Resume RAG error: {e}")
-            return "I encountered an error reading your PDF. Please ensure it's a standard digital file."
+        with upload:
+            try:
+                return self.analyze_upload(upload)
+            except ResumeExtractionError as e:
+                return str(e)
+            except Exception as e:
+                logger.error(f"Resume RAG error: {e}")
+                count_error('advisor.analyze_resume', e)
+                return "I encountered an error reading your PDF. Please ensure it's a standard digital file."
+
+    def run_resume_job(self, payload, attachment_path):
+        """Job queue handler: analyze a resume spooled to disk by the upload route.
+
+        Problems with the file itself are the result; anything else (e.g. a
+        failed Gemini call) propagates so the queue retries the job.
+        """
+        if not self.client:
+            return {"message": "Resume analysis is currently offline."}
+        if attachment_path is None:
+            raise PermanentJobError("The uploaded file is no longer available. Please upload it again.")
+
+        upload = SpooledUpload(path=attachment_path, size=payload['size'], sha256=payload['sha256'])
+        try:
+            return {"message": self.analyze_upload(upload)}
+        except ResumeExtractionError as e:
+            return {"message": str(e)}
+
+    def analyze_upload(self, upload):
+        """Audit a spooled upload. Raises ResumeExtractionError for unusable
+        files and lets other errors through; the caller closes the upload."""
+        # Re-uploads of the same file against the same catalog skip everything below
+        analysis_key = f"analysis:{upload.sha256}:{self.catalog_version}:{self.model_id}"
+        cached_analysis = self.resume_cache.get(analysis_key)
+        count_cache('resume_analysis', cached_analysis is not None)
+        if cached_analysis is not None:
+            return cached_analysis
+
+        # 1. Extract text from the PDF (size/page/time capped, off-thread)
+        text_key = f"text:{upload.sha256}"
+        resume_text = self.resume_cache.get(text_key)
+        count_cache('resume_text', resume_text is not None)
+        if resume_text is None:
+            with stage('advisor', 'pdf_extraction'):
+                resume_text = self.extractor.extract_text(upload)["text"]
+            self.resume_cache.set(text_key, resume_text)
+
+        if len(resume_text.strip()) < 50:
+            return "I couldn't find enough text in that file. Please upload a digital PDF."
+
+        # 2. RETRIEVAL: Find REAL TXST courses based on resume content
+        # Rank the catalog against the whole resume, boosted by the topics it mentions
+        resume_topics = self._extract_topics(resume_text)
+        relevant_db_courses = self._retrieve_courses(resume_text, resume_topics[:5], limit=10)
+        
+        # Format the "Truth" context for the AI
+        valid_course_context = self._build_course_context(relevant_db_courses) or "Consult the TXST CS catalog."
+
+        # 3. GROUNDED PROMPT (Persona: Encouraging Advisor)
+        prompt = f"""
+        ACT AS: A supportive and encouraging Texas State University CS Academic Advisor.
+        TASK: Provide a constructive audit of the student's resume and recommend REAL courses.
+        
+        ---
+        VALID TEXAS STATE COURSES (ONLY RECOMMEND FROM THIS LIST):
+        {valid_course_context}
+        ---
+        STUDENT RESUME TEXT:
+        {resume_text}
+        ---
+        STRICT RULES:
+        1. NEVER make up a course number. ONLY recommend courses from the 'VALID TEXAS STATE COURSES' list above.
+        2. If the document is NOT a resume, politely explain what a professional CS resume should include.
+        3. Tone: Be positive, encouraging, and helpful. Start with a compliment about their existing skills.
+        4. Identify 2 specific technical areas for growth and recommend 2 courses from the provided list to help.
+        5. FORMAT: Use plain text only. NO bolding (**), NO italics, NO markdown.
+        6. Keep the response under 150 words.
+        """
+
+        response = self._generate('resume', prompt)
+        
+        # Clean up any residual markdown formatting
+        analysis = response.text.strip().replace("**", "").replace("__", "")
+        self.resume_cache.set(analysis_key, analysis)
+        return analysis
 
     def get_response(self, user_id, message):
         """Main advisor interface for chat"""
+        # Factual catalog questions are answered from the graph, with or without Gemini
+        local = self._answer_locally(user_id, message)
+        if local is not None:
+            return local
         if self.client:
-            return self._get_gemini_response(message)
+            ADVISOR_INTENTS.inc(intent='llm')
+            return self._get_gemini_response(message, user_id)
+        ADVISOR_INTENTS.inc(intent='fallback')
         return self._get_rule_based_response(message)
 
-    def _get_gemini_response(self, message):
+    @timed('advisor', 'intent_routing')
+    def _answer_locally(self, user_id, message):
+        """Templated answer for a prerequisite, unlock, lookup or topic-list
+        question; None sends the question on to Gemini"""
         try:
+            intent = intent_router.classify(message, self.topic_matcher)
+            if intent is None and not self._extract_topics(message):
+                # "what does it unlock?" refers to the course discussed last turn
+                session = self.memory.get(user_id)
+                if session and session.get('topics'):
+                    intent = intent_router.classify(f"{' '.join(session['topics'])} {message}", self.topic_matcher)
+            if intent is None:
+                return None
+            handler = {
+                intent_router.PREREQUISITES: self._answer_prerequisites,
+                intent_router.UNLOCKS: self._answer_unlocks,
+                intent_router.LOOKUP: self._answer_lookup,
+                intent_router.TOPIC_LIST: self._answer_topic_list,
+            }[intent.kind]
+            answer = handler(intent)
+        except Exception as e:
+            logger.error(f"Intent routing error: {e}")
+            count_error('advisor.intent', e)
+            return None
+        if answer is None:
+            return None
+
+        ADVISOR_INTENTS.inc(intent=intent.kind)
+        # The asked-about course codes become the session topics, so "what does it unlock?" still resolves
+        topics = [self._graph_course(c).name.split(':')[0] for c in intent.course_ids[:3]] or intent.topics
+        self.memory.record(user_id, message, answer["message"], topics)
+        return answer
+
+    def _graph_course(self, course_id):
+        """Course-like view of a graph node, for the answer templates"""
+        graph = self.journey_map.course_graph if self.journey_map else None
+        if graph is None or course_id not in graph:
+            return None
+        return SimpleNamespace(id=course_id, **graph.nodes[course_id])
+
+    def _course_list(self, course_ids):
+        names = [self._graph_course(course_id).name for course_id in course_ids]
+        if len(names) <= 2:
+            return " and ".join(names)
+        return f"{', '.join(names[:-1])} and {names[-1]}"
+
+    def _answer_prerequisites(self, intent):
+        lines, courses = [], []
+        for course_id in intent.course_ids[:3]:
+            course = self._graph_course(course_id)
+            if course is None:
+                return None
+            graph = self.journey_map.course_graph
+            direct = sorted(graph.predecessors(course_id))
+            if not direct:
+                lines.append(f"{course.name} has no prerequisites listed in the catalog.")
+                continue
+            lines.append(f"{course.name} requires {self._course_list(direct)}.")
+            chain = self.journey_map.get_subgraph([course_id], direction='prerequisites')
+            # Foundations first: order the full chain by how deep each course sits
+            earlier = [node["id"] for node in chain["nodes"] if node["id"] != course_id]
+            if len(earlier) > len(direct):
+                analytics = self.journey_map.analytics
+                earlier.sort(key=lambda c: ((analytics.for_course(c) or {}).get('depth', 0), c))
+                lines.append(f"The full chain, in order, is {self._course_list(earlier)}.")
+            courses.extend(self._graph_course(c) for c in direct)
+        return self._local_answer(lines, courses)
+
+    def _answer_unlocks(self, intent):
+        lines, courses = [], []
+        for course_id in intent.course_ids[:3]:
+            course = self._graph_course(course_id)
+            if course is None:
+                return None
+            direct = sorted(self.journey_map.course_graph.successors(course_id))
+            if not direct:
+                lines.append(f"{course.name} is not a prerequisite for any other course in the catalog.")
+                continue
+            lines.append(f"{course.name} is a direct prerequisite for {self._course_list(direct)}.")
+            unlocks = (self.journey_map.analytics.for_course(course_id) or {}).get('unlock_count', 0)
+            if unlocks > len(direct):
+                lines.append(f"Counting what those lead to, it opens the way to {unlocks} courses in total.")
+            courses.extend(self._graph_course(c) for c in direct)
+        return self._local_answer(lines, courses)
+
+    def _answer_lookup(self, intent):
+        lines, courses = [], []
+        for course_id in intent.course_ids[:3]:
+            course = self._graph_course(course_id)
+            if course is None:
+                return None
+            prereqs = sorted(self.journey_map.course_graph.predecessors(course_id))
+            requires = f" Prerequisites: {self._course_list(prereqs)}." if prereqs else " No prerequisites."
+            lines.append(f"{course.name} (level {course.level or 1}). {self._course_snippet(course)}{requires}")
+            courses.append(course)
+        return self._local_answer(lines, courses)
+
+    def _answer_topic_list(self, intent):
+        results = self._retrieve_courses(' '.join(intent.topics), intent.topics, limit=5)
+        if not results:
+            # Nothing in the catalog matched; Gemini can still say something useful
+            return None
+        names = "; ".join(course.name for course in results)
+        return self._local_answer([f"Courses covering {', '.join(intent.topics)}: {names}."], results)
+
+    def _local_answer(self, lines, courses):
+        unique = list({course.id: course for course in courses}.values())
+        return {
+            "message": " ".join(lines),
+            "courses": [self._get_course_details(c) for c in unique[:3]]
+        }
+
+    def _get_gemini_response(self, message, user_id=None):
+        try:
+            session = self.memory.get(user_id)
             topics = self._extract_topics(message)
-            context_courses = []
-            if topics:
-                db_results = self._find_course_by_topic(topics[0], limit=8)
-                context_courses = [f"{c.name}: {c.description}" for c in db_results]
-            
-            course_text = "\n".join(context_courses) if context_courses else "Refer to general TxST CS guidelines."
-
-            system_instruction = """You are the Texas State University Computer Science Advisor.
-            RULES:
-            1. ONLY recommend courses listed in the 'PROVIDED CONTEXT'. 
-            2. If a course isn't there, say you don't have its specific details and suggest the official catalog.
-            3. NEVER use Markdown bolding (no **) or italics. Use plain text only.
-            4. Keep responses under 120 words.
-            5. Be encouraging but factually strict."""
-
-            response = self.client.models.generate_content(
-                model=self.model_id,
-                config=types.GenerateContentConfig(system_instruction=system_instruction),
-                contents=f"PROVIDED CONTEXT:\n{course_text}\n\nSTUDENT QUESTION: {message}"
+            query = message
+            if not topics and session and session.get('topics'):
+                # Follow-ups ("what are its prerequisites?") inherit the last turn's topics
+                topics = session['topics']
+                query = f"{' '.join(topics)} {message}"
+            history = self.memory.render(session)
+
+            # Students asking the same thing at the same moment share one retrieval + LLM call
+            result, shared = self.flights.do(
+                self._flight_key(message, topics, history),
+                lambda: self._answer_question(message, query, topics, history),
+                timeout=self.flight_timeout
             )
-            
-            clean_text = response.text.strip().replace("**", "").replace("__", "")
-            recommended = self._find_course_by_topic(topics[0] if topics else "", limit=3)
-            
-            return {
-                "message": clean_text,
-                "courses": [self._get_course_details(c) for c in recommended]
-            }
+            count_cache('chat_single_flight', shared)
+
+            self.memory.record(user_id, message, result['message'], topics)
+            return result
 
         except Exception as e:
             logger.error(f"Gemini error: {e}")
+            count_error('advisor.chat', e)
             return self._get_rule_based_response(message)
 
+    def _flight_key(self, message, topics, history):
+        """Identity of a chat answer: normalized question plus everything fed into the prompt"""
+        normalized = re.sub(r'[^\w\s]', '', message.lower())
+        normalized = ' '.join(normalized.split())
+        context = hashlib.sha256('\x1f'.join([','.join(topics), history]).encode('utf-8')).hexdigest()
+        return f"chat:{self.model_id}:{self.catalog_version}:{normalized}:{context}"
+
+    def _answer_question(self, message, query, topics, history):
+        db_results = self._retrieve_courses(query, topics, limit=8)
+        course_text = self._build_course_context(db_results) or "Refer to general TxST CS guidelines."
+        history_text = f"CONVERSATION SO FAR:\n{history}\n\n" if history else ""
+
+        system_instruction = """You are the Texas State University Computer Science Advisor.
+        RULES:
+        1. ONLY recommend courses listed in the 'PROVIDED CONTEXT'. 
+        2. If a course isn't there, say you don't have its specific details and suggest the official catalog.
+        3. NEVER use Markdown bolding (no **) or italics. Use plain text only.
+        4. Keep responses under 120 words.
+        5. Be encouraging but factually strict."""
+
+        response = self._generate(
+            'chat',
+            f"{history_text}PROVIDED CONTEXT:\n{course_text}\n\nSTUDENT QUESTION: {message}",
+            config=types.GenerateContentConfig(system_instruction=system_instruction)
+        )
+
+        clean_text = response.text.strip().replace("**", "").replace("__", "")
+        recommended = db_results[:3]
+
+        return {
+            "message": clean_text,
+            "courses": [self._get_course_details(c) for c in recommended]
+        }
+
+    def _generate(self, kind, contents, config=None):
+        """Call Gemini, recording latency, token usage and failures"""
+        try:
+            with stage('advisor', f'llm_{kind}'):
+                response = self.client.models.generate_content(
+                    model=self.model_id,
+                    config=config,
+                    contents=contents
+                )
+        except Exception:
+            LLM_REQUESTS.inc(kind=kind, outcome='error')
+            raise
+        LLM_REQUESTS.inc(kind=kind, outcome='ok')
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            LLM_TOKENS.inc(getattr(usage, 'prompt_token_count', None) or 0, kind=kind, direction='prompt')
+            LLM_TOKENS.inc(getattr(usage, 'candidates_token_count', None) or 0, kind=kind, direction='output')
+        return response
+
+    @timed('advisor', 'topic_extraction')
     def _extract_topics(self, message):
-        keywords = ["python", "web", "data", "security", "ai", "software", "machine learning", "coding", "java", "c++", "cloud"]
-        found = [k for k in keywords if k in message.lower()]
-        codes = re.findall(r'CS\s?\d{4}', message.upper())
-        return codes + found
+        return self.topic_matcher.match(message)
+
+    @timed('advisor', 'retrieval')
+    def _retrieve_courses(self, text, topics, limit=8):
+        """Context courses for a prompt: vector search when the index is
+        built, otherwise the keyword lookup on the strongest topic"""
+        if self.retriever.ready:
+            return self.retriever.search(text, k=limit, boost_terms=topics)
+        if topics:
+            return self._find_course_by_topic(topics[0], limit=limit)
+        return []
 
+    @timed('advisor', 'find_course_by_topic')
     def _find_course_by_topic(self, topic, limit=3):
         if not self.app or not topic: return []
         with self.app.app_context():
+            course_id = self.topic_matcher.resolve_code(topic)
+            if course_id is not None:
+                course = self.db.session.get(self.Course, course_id)
+                return [course] if course else []
             return self.Course.query.filter(
+                self.Course.catalog == self.catalog,
                 (self.Course.name.ilike(f"%{topic}%")) | 
                 (self.Course.description.ilike(f"%{topic}%"))
             ).limit(limit).all()
 
+    @timed('advisor', 'prompt_build')
+    def _build_course_context(self, courses):
+        """Pack course snippets, most relevant first, into the prompt's context budget"""
+        budget = self.context_tokens
+        lines = []
+        for course in courses:
+            line = f"{course.name}: {self._course_snippet(course)}"
+            cost = getattr(course, 'snippet_tokens', None)
+            cost = estimate_tokens(line) if cost is None else cost + estimate_tokens(course.name) + 1
+            if cost > budget:
+                continue
+            lines.append(line)
+            budget -= cost
+        return "\n".join(lines)
+
+    @staticmethod
+    def _course_snippet(course):
+        return getattr(course, 'snippet', None) or make_snippet(html_to_text(course.description))
+
     def _get_course_details(self, course):
         return {
             "id": course.id,
             "name": course.name,
-            "description": course.description[:150] + "...",
+            "description": self._course_snippet(course),
             "department": getattr(course, 'department', 'CS')
         }
 
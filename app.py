@@ -4,8 +4,9 @@ A web-based academic advisor for CS students at Texas State University
 """
 
 from flask import Flask
-from extensions import db
+from extensions import db, init_db, normalize_database_url, engine_options
 import os
+import time
 import logging
 
 # Set up logging
@@ -18,6 +19,7 @@ logger = logging.getLogger('app')
 
 def create_app():
     """Application factory function"""
+    boot_start = time.perf_counter()
     app = Flask(__name__)
     
     # Configure the Flask app
@@ -25,21 +27,109 @@ def create_app():
     instance_path = os.path.join(basedir, "instance")
     os.makedirs(instance_path, exist_ok=True)
     
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(instance_path, "courses.db")}'
+    # Database: a SQLite file by default, or any SQLAlchemy URL (e.g. PostgreSQL) via DATABASE_URL
+    default_db = f'sqlite:///{os.path.join(instance_path, "courses.db")}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(os.environ.get('DATABASE_URL')) or default_db
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Connection pool for server databases; PRAGMA tuning for SQLite (see extensions.py)
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_BYTES'] = int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-    
+
+    # Resume upload limits (see resume_extractor.py)
+    app.config['RESUME_MAX_BYTES'] = int(os.environ.get('RESUME_MAX_BYTES', 5 * 1024 * 1024))
+    app.config['RESUME_MAX_PAGES'] = int(os.environ.get('RESUME_MAX_PAGES', 10))
+    app.config['RESUME_MAX_TOKENS'] = int(os.environ.get('RESUME_MAX_TOKENS', 3000))
+    app.config['RESUME_EXTRACT_TIMEOUT'] = float(os.environ.get('RESUME_EXTRACT_TIMEOUT', 10))
+    app.config['RESUME_EXTRACT_WORKERS'] = int(os.environ.get('RESUME_EXTRACT_WORKERS', 2))
+    app.config['RESUME_WORKER_MEMORY_MB'] = int(os.environ.get('RESUME_WORKER_MEMORY_MB', 256))
+    app.config['RESUME_SPOOL_DIR'] = os.environ.get('RESUME_SPOOL_DIR') or None
+
+    # Resume result cache; keep retention short since entries hold personal data
+    app.config['RESUME_CACHE_SIZE'] = int(os.environ.get('RESUME_CACHE_SIZE', 256))
+    app.config['RESUME_CACHE_TTL'] = int(os.environ.get('RESUME_CACHE_TTL', 86400))
+    app.config['RESUME_CACHE_DIR'] = os.environ.get('RESUME_CACHE_DIR') or None
+
+    # Per-user chat memory; use the sqlite backend to share sessions across workers
+    app.config['CHAT_SESSION_BACKEND'] = os.environ.get('CHAT_SESSION_BACKEND', 'memory')
+    app.config['CHAT_SESSION_DB'] = os.environ.get('CHAT_SESSION_DB', os.path.join(instance_path, 'chat_sessions.db'))
+    app.config['CHAT_MAX_USERS'] = int(os.environ.get('CHAT_MAX_USERS', 1000))
+    app.config['CHAT_MAX_TURNS'] = int(os.environ.get('CHAT_MAX_TURNS', 6))
+    app.config['CHAT_IDLE_TTL'] = int(os.environ.get('CHAT_IDLE_TTL', 1800))
+    app.config['CHAT_HISTORY_TOKENS'] = int(os.environ.get('CHAT_HISTORY_TOKENS', 600))
+
+    # Token budget for catalog context packed into each Gemini prompt
+    app.config['PROMPT_CONTEXT_TOKENS'] = int(os.environ.get('PROMPT_CONTEXT_TOKENS', 400))
+
+    # Coalescing of identical concurrent chat questions; set a directory to share across workers
+    app.config['SINGLE_FLIGHT_TIMEOUT'] = float(os.environ.get('SINGLE_FLIGHT_TIMEOUT', 30))
+    app.config['SINGLE_FLIGHT_DIR'] = os.environ.get('SINGLE_FLIGHT_DIR') or None
+    app.config['SINGLE_FLIGHT_RESULT_TTL'] = float(os.environ.get('SINGLE_FLIGHT_RESULT_TTL', 2))
+
+    # /metrics: bearer token (local requests only when unset); METRICS_DIR sums all workers' metrics
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN') or None
+    app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR') or None
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+    # Opt-in request profiling: sampled by rate, or forced with the PROFILE_TOKEN header
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_MODE'] = os.environ.get('PROFILE_MODE', 'sample')  # 'sample' or 'cprofile'
+    app.config['PROFILE_INTERVAL_MS'] = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(instance_path, 'profiles'))
+    app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN') or None
+
+    # HTTP caching/compression of catalog-derived responses
+    app.config['RESPONSE_CACHE_MAX_AGE'] = int(os.environ.get('RESPONSE_CACHE_MAX_AGE', 300))
+    app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+
+    # Background jobs (resume analysis); with a same-host `python job_queue.py` worker, set JOB_WORKERS=0 on web.
+    # Workers are started by the serving entry points (gunicorn.conf.py, app.py), not on import.
+    app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', 2))
+    app.config['JOB_AUTOSTART'] = os.environ.get('JOB_AUTOSTART', '0') == '1'
+    app.config['JOB_MAX_ATTEMPTS'] = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    app.config['JOB_RETRY_DELAY'] = float(os.environ.get('JOB_RETRY_DELAY', 5))
+    app.config['JOB_LEASE_SECONDS'] = float(os.environ.get('JOB_LEASE_SECONDS', 300))
+    app.config['JOB_RESULT_TTL'] = int(os.environ.get('JOB_RESULT_TTL', 3600))
+    app.config['JOB_DB'] = os.environ.get('JOB_DB', os.path.join(instance_path, 'jobs.db'))
+    app.config['JOB_DIR'] = os.environ.get('JOB_DIR', os.path.join(instance_path, 'jobs'))
+
+    # Catalog namespaces: importer sources and the memory budget for lazily loaded catalogs
+    from models import DEFAULT_CATALOG
+    from catalogs import parse_catalog_sources
+    app.config['DEFAULT_CATALOG'] = os.environ.get('DEFAULT_CATALOG', DEFAULT_CATALOG)
+    app.config['CATALOG_SOURCES'] = parse_catalog_sources(os.environ.get('CATALOG_SOURCES'))
+    app.config['CATALOG_MEMORY_MB'] = int(os.environ.get('CATALOG_MEMORY_MB', 512))
+    app.config['CATALOG_MODEL_DIR'] = os.environ.get('CATALOG_MODEL_DIR', os.path.join(basedir, 'model'))
+    # Seconds between checks for catalogs re-imported by another process
+    app.config['CATALOG_CHECK_INTERVAL'] = float(os.environ.get('CATALOG_CHECK_INTERVAL', 5))
+
     # Initialize extensions
-    db.init_app(app)
+    init_db(app)
     
     # Initialize app context and create tables
     with app.app_context():
         # Import models (after db initialized)
-        from models import Course, CoursePrerequisite
+        from models import (Course, CoursePrerequisite, upgrade_catalog_column, upgrade_course_text_columns,
+                            upgrade_prerequisite_indexes)
         
         # Create database tables
         db.create_all()
         logger.info("Database tables created")
+
+        if upgrade_catalog_column():
+            logger.info("Added catalog column; existing courses moved to the default catalog")
+
+        upgrade_prerequisite_indexes()
+
+        backfilled = upgrade_course_text_columns()
+        if backfilled:
+            logger.info(f"Backfilled plain-text descriptions for {backfilled} courses")
         
         # Import and initialize components
         from ai_advisor import AIAdvisor
@@ -47,38 +137,66 @@ def create_app():
         app.advisor.init_app(app)
         logger.info("AI Advisor initialized")
         
-        from journey_map import JourneyMap
-        app.journey_map = JourneyMap()
-        app.journey_map.init_app(app)
-        logger.info("Journey Map initialized")
+        # Per-catalog graphs and models; the default catalog backs the unscoped routes
+        from catalogs import CatalogRegistry
+        app.catalogs = CatalogRegistry(app)
+
+        def use_default_catalog(bundle):
+            """Point the unscoped routes and the advisor at the (re)built default catalog"""
+            if bundle.name != app.config['DEFAULT_CATALOG']:
+                return
+            app.journey_map = bundle.journey_map
+            app.recommender = bundle.recommender
+            # Advisor retrieves prompt context from the recommender's TF-IDF space
+            app.advisor.retriever = bundle.retriever
+            # ...and answers factual prerequisite questions straight from the graph
+            app.advisor.journey_map = bundle.journey_map
+            if app.advisor.catalog_version != bundle.version:
+                app.advisor.catalog_version = bundle.version
+                app.advisor.build_topic_matcher()
+
+        app.catalogs.on_load(use_default_catalog)
+        app.catalogs.get(app.config['DEFAULT_CATALOG'])
+        logger.info("Journey Map and Course Recommender initialized")
+        
+        # Catalog-derived pages and JSON are rendered/compressed once per catalog version
+        from response_cache import ResponseCache
+        app.response_cache = ResponseCache(
+            app, version_fn=lambda: app.catalogs.version(app.config['DEFAULT_CATALOG'])
+        )
         
-        from recommender import CourseRecommender
-        app.recommender = CourseRecommender()
-        app.recommender.init_app(app)
-        logger.info("Course Recommender initialized")
+        # Request/stage metrics and the /metrics scrape endpoint
+        import metrics
+        metrics.init_app(app, db)
+        metrics.REGISTRY.gauge_callback(
+            'resume_cache_entries', 'Entries held in the in-memory resume cache',
+            lambda: [({}, app.advisor.resume_cache.stats()['entries'])]
+        )
+        metrics.REGISTRY.gauge_callback(
+            'catalog_bundles_loaded', 'Catalogs with their graph and indexes in memory',
+            lambda: [({}, app.catalogs.stats()['loaded'])]
+        )
+        metrics.REGISTRY.gauge_callback(
+            'catalog_bundle_bytes', 'Estimated memory held by loaded catalogs',
+            lambda: [({}, app.catalogs.stats()['bytes'])]
+        )
         
-        # Initialize recommender model
-        model_dir = os.path.join(basedir, 'model')
-        os.makedirs(model_dir, exist_ok=True)
-        recommender_model_path = os.path.join(model_dir, 'recommender_model.pkl')
+        # Worker threads are started by whoever serves the app; unregistered kinds are never claimed
+        from job_queue import JobQueue
+        app.jobs = JobQueue(app)
+        app.jobs.register('resume_analysis', app.advisor.run_resume_job)
         
-        if not os.path.exists(recommender_model_path):
-            logger.info("Training recommender model...")
-            courses = Course.query.all()
-            if courses:
-                app.recommender.train(courses)
-                logger.info(f"Recommender trained with {len(courses)} courses")
-            else:
-                logger.warning("No courses found - run data import first")
-        else:
-            app.recommender.load_model()
-            logger.info("Loaded existing recommender model")
+        from profiling import RequestProfiler
+        app.profiler = RequestProfiler(app, db)
         
         # Register routes (after components initialized)
         from routes import register_routes
         register_routes(app)
         logger.info("Routes registered")
-        
+
+    boot_seconds = time.perf_counter() - boot_start
+    metrics.record_boot('app', boot_seconds)
+    logger.info(f"App built in {boot_seconds:.2f}s (pid {os.getpid()}, rss {metrics.process_memory()['rss'] / 2**20:.0f} MB)")
     return app
 
 
@@ -86,5 +204,6 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
+    app.jobs.start()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
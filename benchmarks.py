@@ -0,0 +1,314 @@
+"""
+Benchmark Suite - Scaling benchmarks on synthetic course catalogs
+Generates catalogs of 1k-100k courses with a layered prerequisite DAG and
+times the recommender, journey map, advisor lookups and importer parsing.
+Results are written as JSON so runs can be compared over time.
+
+Usage:
+    python benchmarks.py                           # 1k, 10k and 100k courses
+    python benchmarks.py --sizes 1000 5000 --repeat 5 --output bench.json
+    python benchmarks.py --sizes 1000 --compare bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+from flask import Flask
+
+from extensions import db
+from text_utils import make_snippet, estimate_tokens
+
+logger = logging.getLogger('benchmarks')
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+COURSES_PER_DEPARTMENT = 400
+TIERS = 8  # prerequisite depth of the generated DAG
+
+VOCABULARY = [
+    "algorithms", "data", "structures", "systems", "software", "engineering", "network", "security",
+    "database", "machine", "learning", "artificial", "intelligence", "web", "cloud", "computing",
+    "operating", "compilers", "graphics", "theory", "programming", "languages", "parallel",
+    "distributed", "mobile", "embedded", "analysis", "design", "architecture", "visualization",
+    "cryptography", "robotics", "human", "interaction", "testing", "verification", "optimization",
+    "statistics", "numerical", "methods", "information", "retrieval", "vision", "signal", "processing",
+]
+
+
+def _department_code(index):
+    letters = ''
+    index += 26 * 26  # always three letters, so codes match [A-Z]{2,4}
+    while index:
+        index, rem = divmod(index, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters[-3:]
+
+
+def generate_catalog(size, seed=42):
+    """Build a synthetic catalog: course dicts in topological (tier) order.
+
+    Courses are split into TIERS bands; each course draws 0-3 prerequisites
+    from the previous band, giving a layered DAG about TIERS levels deep.
+    """
+    rng = random.Random(seed)
+    courses = []
+    next_number = {}
+
+    for i in range(size):
+        tier = i * TIERS // size
+        level = 1 + tier * 4 // TIERS
+        dept = _department_code(rng.randrange(max(1, size // COURSES_PER_DEPARTMENT)))
+        seq = next_number.get((dept, level), 0)
+        next_number[(dept, level)] = seq + 1
+        code = f"{dept} {level}{seq % 1000:03d}"
+        if seq >= 1000:
+            code += chr(ord('A') + seq // 1000 - 1)
+
+        title = ' '.join(rng.choice(VOCABULARY).title() for _ in range(rng.randint(2, 4)))
+        text = ' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(20, 40)))
+
+        prereqs = []
+        if tier > 0:
+            lo, hi = (tier - 1) * size // TIERS, tier * size // TIERS
+            for _ in range(rng.choice([0, 1, 1, 2, 2, 3])):
+                prereq = courses[rng.randrange(lo, hi)]['code']
+                if prereq not in prereqs:
+                    prereqs.append(prereq)
+
+        links = ' and '.join(
+            f'<a href="/search/?P={p.replace(" ", "%20")}" class="bubblelink code">{p.replace(" ", "&#160;")}</a>'
+            for p in prereqs
+        )
+        html = f'<p class="courseblockdesc">(3-0) This course covers {text}.'
+        if links:
+            html += f' Prerequisite: {links} with a grade of "C" or higher.'
+        html += '</p>'
+        plain = f'(3-0) This course covers {text}.' + (
+            f' Prerequisite: {" and ".join(prereqs)} with a grade of "C" or higher.' if prereqs else ''
+        )
+
+        courses.append({
+            'code': code,
+            'name': f"{code}: {title}",
+            'title': title,
+            'description': html,
+            'description_text': plain,
+            'department': dept,
+            'level': level,
+            'prerequisites': prereqs,
+        })
+    return courses
+
+
+def render_catalog_html(catalog):
+    """Render courses the way the catalog site lays out course blocks"""
+    blocks = [
+        f'<div class="courseblock"><p class="courseblocktitle"><strong>{c["code"]}.  {c["title"]}.</strong></p>'
+        f'{c["description"]}</div>'
+        for c in catalog
+    ]
+    return '<html><body><div class="sc_sccoursedescs">' + ''.join(blocks) + '</div></body></html>'
+
+
+def build_app(catalog, workdir):
+    """Isolated Flask app with its own SQLite file loaded with the catalog"""
+    from models import Course, CoursePrerequisite
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['RESUME_EXTRACT_WORKERS'] = 0
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        rows = []
+        for i, c in enumerate(catalog, start=1):
+            snippet = make_snippet(c['description_text'])
+            rows.append({
+                'id': i, 'name': c['name'], 'description': c['description'],
+                'description_text': c['description_text'], 'snippet': snippet,
+                'snippet_tokens': estimate_tokens(snippet),
+                'department': c['department'], 'level': c['level'],
+            })
+        db.session.execute(Course.__table__.insert(), rows)
+
+        ids = {c['code']: i for i, c in enumerate(catalog, start=1)}
+        edges = [
+            {'course_id': ids[c['code']], 'prerequisite_id': ids[p]}
+            for c in catalog for p in c['prerequisites']
+        ]
+        if edges:
+            db.session.execute(CoursePrerequisite.__table__.insert(), edges)
+        db.session.commit()
+    return app
+
+
+def measure(func, repeat):
+    """Time func over `repeat` runs, then once more under tracemalloc for peak memory"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'runs': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+        'mean_s': statistics.fmean(timings),
+        'peak_mem_bytes': peak,
+    }
+
+
+def run_size(size, repeat, seed, dense_budget_mb):
+    """Run every benchmark against one synthetic catalog size"""
+    from models import Course
+    from recommender import CourseRecommender
+    from journey_map import JourneyMap
+    from ai_advisor import AIAdvisor
+    from course_importer import parse_course_blocks
+
+    catalog = generate_catalog(size, seed)
+    deepest_id = size  # last course sits in the deepest tier
+    results = []
+
+    def record(name, func, heavy=False, skip=None):
+        entry = {'size': size, 'benchmark': name}
+        if skip:
+            entry['skipped'] = skip
+            logger.warning(f"[{size}] {name}: skipped ({skip})")
+        else:
+            runs = 1 if heavy and size > 10000 else repeat
+            entry.update(measure(func, runs))
+            logger.warning(f"[{size}] {name}: median {entry['median_s'] * 1000:.2f} ms, "
+                           f"peak {entry['peak_mem_bytes'] / 1e6:.1f} MB")
+        results.append(entry)
+
+    html = render_catalog_html(catalog)
+    record('importer.parse_course_blocks', lambda: parse_course_blocks(html), heavy=True)
+    del html
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = build_app(catalog, workdir)
+        with app.app_context():
+            courses = Course.query.all()
+
+            recommender = CourseRecommender(app)
+            recommender.model_path = os.path.join(workdir, 'recommender_model.pkl')
+            # train() materializes a dense n x n similarity matrix
+            dense_mb = size * size * 8 / 1e6
+            too_big = f"dense similarity matrix needs {dense_mb:,.0f} MB" if dense_mb > dense_budget_mb else None
+            record('recommender.train', lambda: recommender.train(courses), heavy=True, skip=too_big)
+            untrained = too_big and "requires recommender.train"
+            record('recommender.recommend_courses',
+                   lambda: recommender.recommend_courses("machine learning security"), skip=untrained)
+            record('recommender.recommend_based_on_course',
+                   lambda: recommender.recommend_based_on_course(size // 2), skip=untrained)
+
+            journey = JourneyMap(app)
+            record('journey_map.build_course_graph', journey.build_course_graph, heavy=True)
+            record('journey_map.get_prerequisite_chain', lambda: journey.get_prerequisite_chain(deepest_id))
+            record('journey_map.get_course_graph_data', journey.get_course_graph_data, heavy=True)
+            record('journey_map.get_bottlenecks', lambda: journey.get_bottlenecks('bottleneck', 20))
+
+            advisor = AIAdvisor()
+            advisor.init_app(app)
+            record('ai_advisor._find_course_by_topic[phrase]',
+                   lambda: advisor._find_course_by_topic("network security", limit=8))
+            record('ai_advisor._find_course_by_topic[code]',
+                   lambda: advisor._find_course_by_topic(catalog[-1]['code'], limit=8))
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """Print median-time ratios against a previous results file"""
+    previous = {(r['size'], r['benchmark']): r for r in baseline.get('results', [])}
+    print(f"\n{'benchmark':<45} {'size':>7} {'before ms':>11} {'after ms':>11} {'ratio':>7}")
+    for r in current['results']:
+        old = previous.get((r['size'], r['benchmark']))
+        if not old or 'median_s' not in r or 'median_s' not in old:
+            continue
+        ratio = r['median_s'] / old['median_s'] if old['median_s'] else float('inf')
+        print(f"{r['benchmark']:<45} {r['size']:>7} {old['median_s'] * 1000:>11.2f} "
+              f"{r['median_s'] * 1000:>11.2f} {ratio:>6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the advisor components on synthetic catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="catalog sizes to generate")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dense-budget-mb', type=float, default=1024,
+                        help="skip benchmarks that would allocate a dense n x n matrix larger than this")
+    parser.add_argument('--output', help="write JSON results to this file (default: stdout)")
+    parser.add_argument('--compare', help="previous JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    # Component INFO logs (one line per parsed course) would swamp the timings
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    logging.disable(logging.INFO)
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, args.repeat, args.seed, args.dense_budget_mb))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sizes': args.sizes,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.warning(f"Results written to {args.output}")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+Catalog Registry - Per-catalog course graphs and search indexes
+Each catalog namespace (one department or institution) gets its own
+JourneyMap, recommender model and retrieval index. Bundles are built on
+first access and evicted least-recently-used once their estimated size
+exceeds the memory budget; the default catalog is always kept loaded.
+Loaded bundles are rebuilt when the importer bumps their catalog revision.
+"""
+
+import os
+import re
+import glob
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from models import DEFAULT_CATALOG
+from metrics import count_cache
+from single_flight import SingleFlight
+
+logger = logging.getLogger('catalogs')
+
+CATALOG_NAME = re.compile(r'^[a-z0-9][a-z0-9_-]{0,49}$')
+DEFAULT_SOURCES = {DEFAULT_CATALOG: 'https://mycatalog.txstate.edu/courses/cs/'}
+
+# Rough per-object overheads of the networkx graph and the TF-IDF vocabulary
+GRAPH_NODE_BYTES = 1500
+GRAPH_EDGE_BYTES = 400
+VOCABULARY_TERM_BYTES = 100
+
+
+class UnknownCatalogError(KeyError):
+    """Raised for catalog names that are invalid or have no courses"""
+
+
+def parse_catalog_sources(value):
+    """Parse 'name=url,name=url' into {name: url}, falling back to the TxST CS catalog"""
+    sources = {}
+    for item in (value or '').split(','):
+        name, sep, url = item.strip().partition('=')
+        if not sep:
+            continue
+        name = name.strip().lower()
+        if not CATALOG_NAME.match(name):
+            logger.warning(f"Ignoring invalid catalog name: {name!r}")
+            continue
+        sources[name] = url.strip()
+    return sources or dict(DEFAULT_SOURCES)
+
+
+class CatalogBundle:
+    """Everything derived from one catalog's courses"""
+
+    def __init__(self, name, version, journey_map, recommender, retriever, revision=0):
+        self.name = name
+        self.version = version
+        self.revision = revision
+        self.journey_map = journey_map
+        self.recommender = recommender
+        self.retriever = retriever
+        self.nbytes = estimate_bundle_bytes(self)
+
+
+def estimate_bundle_bytes(bundle):
+    """Approximate resident size of a bundle's models, used for eviction"""
+    total = 0
+    recommender = bundle.recommender
+    if recommender.similarity_matrix is not None:
+        total += recommender.similarity_matrix.nbytes
+    if recommender.courses_df is not None:
+        total += int(recommender.courses_df.memory_usage(deep=True).sum())
+    if recommender.vectorizer is not None:
+        total += len(getattr(recommender.vectorizer, 'vocabulary_', {})) * VOCABULARY_TERM_BYTES
+
+    retriever = bundle.retriever
+    if retriever.matrix is not None:
+        total += retriever.matrix.nbytes
+        total += sum(len(c.name) + len(c.description or '') + len(c.snippet or '') for c in retriever.courses)
+
+    graph = bundle.journey_map.course_graph
+    if graph is not None:
+        total += graph.number_of_nodes() * GRAPH_NODE_BYTES + graph.number_of_edges() * GRAPH_EDGE_BYTES
+        total += sum(len(data.get('description') or '') for _, data in graph.nodes(data=True))
+    return total
+
+
+class CatalogRegistry:
+    """Lazily loaded, memory-bounded per-catalog components"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.default_catalog = DEFAULT_CATALOG
+        self.memory_budget = 512 * 1024 * 1024
+        self.model_dir = None
+        self.check_interval = 5.0
+        self._bundles = OrderedDict()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()  # concurrent first requests build a catalog once
+        self._next_check = 0.0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.default_catalog = app.config.get('DEFAULT_CATALOG', self.default_catalog)
+        self.memory_budget = app.config.get('CATALOG_MEMORY_MB', 512) * 1024 * 1024
+        self.model_dir = app.config.get('CATALOG_MODEL_DIR') or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'model'
+        )
+        self.check_interval = app.config.get('CATALOG_CHECK_INTERVAL', self.check_interval)
+        app.before_request(self._refresh_before_request)
+
+    def on_load(self, callback):
+        """Call callback(bundle) whenever a catalog is built or rebuilt"""
+        self._listeners.append(callback)
+
+    def get(self, catalog):
+        """Return the loaded bundle for a catalog, building it on first use"""
+        if not catalog or not CATALOG_NAME.match(catalog):
+            raise UnknownCatalogError(catalog)
+
+        self.refresh()
+        with self._lock:
+            bundle = self._bundles.get(catalog)
+            if bundle is not None:
+                self._bundles.move_to_end(catalog)
+        count_cache('catalog', bundle is not None)
+        if bundle is not None:
+            return bundle
+
+        return self._install(catalog)
+
+    def version(self, catalog):
+        return self.get(catalog).version
+
+    def refresh(self, force=False):
+        """Rebuild loaded catalogs whose revision moved since they were built.
+
+        Runs at most once per check_interval (one small query); the old bundle
+        keeps serving other requests until its replacement is ready.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_check:
+                return []
+            self._next_check = now + self.check_interval
+            loaded = {name: bundle.revision for name, bundle in self._bundles.items()}
+        if not loaded:
+            return []
+
+        from models import catalog_revisions
+        try:
+            with self.app.app_context():
+                revisions = catalog_revisions()
+        except Exception as e:
+            logger.error(f"Failed to check catalog revisions: {e}")
+            return []
+
+        changed = [name for name, revision in loaded.items() if revisions.get(name, 0) != revision]
+        for name in changed:
+            logger.info(f"Catalog {name} changed (revision {revisions.get(name, 0)}), rebuilding")
+            try:
+                self._install(name, retrain=True)
+            except UnknownCatalogError:
+                self.invalidate(name)  # emptied by the import
+            except Exception as e:
+                logger.error(f"Failed to rebuild catalog {name}: {e}")
+        return changed
+
+    def invalidate(self, catalog=None):
+        """Drop one catalog's bundle (or all of them) so it is rebuilt on next access"""
+        with self._lock:
+            if catalog is None:
+                self._bundles.clear()
+            else:
+                self._bundles.pop(catalog, None)
+
+    def catalogs(self):
+        """Every catalog in the database with its size and load state"""
+        from models import list_catalogs
+
+        with self.app.app_context():
+            rows = list_catalogs()
+        with self._lock:
+            loaded = {name: bundle.nbytes for name, bundle in self._bundles.items()}
+        return [{
+            "catalog": name,
+            "course_count": count,
+            "default": name == self.default_catalog,
+            "loaded": name in loaded,
+            "estimated_bytes": loaded.get(name)
+        } for name, count in rows]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": len(self._bundles),
+                "bytes": sum(bundle.nbytes for bundle in self._bundles.values()),
+                "budget_bytes": self.memory_budget
+            }
+
+    def _refresh_before_request(self):
+        self.refresh()  # a before_request return value would replace the response
+
+    def _install(self, catalog, retrain=False):
+        bundle, _ = self._loads.do(catalog, lambda: self._load(catalog, retrain))
+        with self._lock:
+            self._bundles[catalog] = bundle
+            self._bundles.move_to_end(catalog)
+            self._evict(keep=catalog)
+        for callback in self._listeners:
+            callback(bundle)
+        return bundle
+
+    def _evict(self, keep):
+        total = sum(bundle.nbytes for bundle in self._bundles.values())
+        for name in list(self._bundles):
+            if total <= self.memory_budget:
+                break
+            if name in (keep, self.default_catalog):
+                continue
+            total -= self._bundles.pop(name).nbytes
+            logger.info(f"Evicted catalog {name} ({total / 1e6:.1f} MB still loaded)")
+
+    def _model_path(self, catalog, version):
+        if catalog == self.default_catalog:
+            return os.path.join(self.model_dir, 'recommender_model.pkl')
+        # Versioned so a re-imported catalog never loads a stale model
+        return os.path.join(self.model_dir, 'catalogs', f"{catalog}-{version}.pkl")
+
+    def _load(self, catalog, retrain=False):
+        from models import Course, compute_catalog_version, catalog_revisions
+        from journey_map import JourneyMap
+        from recommender import CourseRecommender
+        from retrieval import RetrievalEngine
+
+        with self.app.app_context():
+            # Read before the courses: an import landing in between only causes one extra rebuild
+            revision = catalog_revisions().get(catalog, 0)
+            courses = Course.query.filter_by(catalog=catalog).all()
+            # The default catalog may legitimately be empty before the first import
+            if not courses and catalog != self.default_catalog:
+                raise UnknownCatalogError(catalog)
+            version = compute_catalog_version(catalog)
+
+            journey_map = JourneyMap(catalog=catalog)
+            journey_map.init_app(self.app)
+
+            recommender = CourseRecommender(self.app)
+            recommender.model_path = self._model_path(catalog, version)
+            # The default catalog's model file is not versioned, so a changed catalog always retrains
+            if not retrain and os.path.exists(recommender.model_path) and recommender.load_model():
+                logger.info(f"Loaded recommender model for catalog {catalog}")
+            elif courses:
+                logger.info(f"Training recommender for catalog {catalog}...")
+                recommender.train(courses)
+                self._remove_stale_models(catalog, recommender.model_path)
+            else:
+                logger.warning("No courses found - run data import first")
+
+            retriever = RetrievalEngine()
+            retriever.build(recommender)
+
+        bundle = CatalogBundle(catalog, version, journey_map, recommender, retriever, revision)
+        logger.info(f"Catalog {catalog} loaded: {len(courses)} courses, ~{bundle.nbytes / 1e6:.1f} MB")
+        return bundle
+
+    def _remove_stale_models(self, catalog, current_path):
+        if catalog == self.default_catalog:
+            return
+        for path in glob.glob(os.path.join(self.model_dir, 'catalogs', f"{glob.escape(catalog)}-*.pkl")):
+            if path != current_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
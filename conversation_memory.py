@@ -0,0 +1,227 @@
+"""
+Conversation Memory - Bounded per-user chat history for multi-turn advising
+Recent turns are kept verbatim; older turns are folded into a rolling summary
+so the history block in each prompt stays within a fixed token budget.
+"""
+
+import os
+import copy
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from text_utils import estimate_tokens, normalize_whitespace, truncate_to_tokens, CHARS_PER_TOKEN
+
+logger = logging.getLogger('conversation_memory')
+
+# Ids sent by clients that don't identify a student; these stay stateless
+ANONYMOUS_USER_IDS = {'', 'default', 'web'}
+
+
+class InProcessSessionBackend:
+    """Sessions in a local LRU. Fast, but private to one worker process."""
+
+    def __init__(self, max_users=1000):
+        self.max_users = max_users
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, user_id):
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return None
+            self._sessions.move_to_end(user_id)
+            # Hand out a copy so concurrent turns don't mutate shared state
+            return copy.deepcopy(session)
+
+    def save(self, user_id, session):
+        with self._lock:
+            self._store(user_id, session)
+
+    def update(self, user_id, change):
+        """Replace a session with change(session or None), atomically"""
+        with self._lock:
+            self._store(user_id, change(copy.deepcopy(self._sessions.get(user_id))))
+
+    def _store(self, user_id, session):
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_users:
+            self._sessions.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite file, shared by every worker on the host.
+
+    Any object with the same load/save/delete methods can be passed to
+    ConversationStore instead, e.g. a wrapper around a networked cache; give
+    it an atomic update(user_id, change) too if workers can share a user.
+    """
+
+    def __init__(self, path, max_users=1000):
+        self.path = path
+        self.max_users = max_users
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_chat_sessions_updated ON chat_sessions (updated_at)")
+
+    def load(self, user_id):
+        row = self._connect().execute(
+            "SELECT data FROM chat_sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, user_id, session):
+        with self._connect() as conn:
+            self._write(conn, user_id, session)
+
+    def update(self, user_id, change):
+        """Replace a session with change(session or None) in one write
+        transaction, so concurrent turns of one user are never lost"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM chat_sessions WHERE user_id = ?", (user_id,)).fetchone()
+            self._write(conn, user_id, change(json.loads(row[0]) if row else None))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def _write(self, conn, user_id, session):
+        conn.execute(
+            "INSERT OR REPLACE INTO chat_sessions (user_id, data, updated_at) VALUES (?, ?, ?)",
+            (user_id, json.dumps(session), time.time())
+        )
+        conn.execute(
+            "DELETE FROM chat_sessions WHERE user_id IN ("
+            "SELECT user_id FROM chat_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_users,)
+        )
+
+    def delete(self, user_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_sessions WHERE user_id = ?", (user_id,))
+
+    def _connect(self):
+        # sqlite3 connections can't cross threads; keep one per thread, reopened
+        # in forked children (gunicorn preload builds the store in the master)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class ConversationStore:
+    """Per-user turn history with LRU eviction, idle expiry and compaction"""
+
+    def __init__(self, backend=None, max_turns=6, idle_ttl=1800, token_budget=600):
+        self.backend = backend if backend is not None else InProcessSessionBackend()
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+
+    def get(self, user_id):
+        """Return the user's live session, or None for new/expired/anonymous users"""
+        if user_id in ANONYMOUS_USER_IDS:
+            return None
+        try:
+            session = self.backend.load(user_id)
+        except Exception as e:
+            logger.error(f"Error loading chat session: {e}")
+            return None
+        if session and self._expired(session):
+            self.backend.delete(user_id)
+            return None
+        return session
+
+    def record(self, user_id, message, reply, topics=None):
+        """Append a turn, compacting older turns to stay within limits"""
+        if user_id in ANONYMOUS_USER_IDS:
+            return
+
+        def add_turn(session):
+            if not session or self._expired(session):
+                session = {'summary': '', 'turns': [], 'topics': []}
+            session['turns'].append({'student': message, 'advisor': reply})
+            if topics:
+                session['topics'] = list(topics)[:5]
+
+            # Keep the verbatim tail short; fold everything older into the summary
+            summary_budget = self.token_budget // 3
+            while len(session['turns']) > 1 and (
+                len(session['turns']) > self.max_turns
+                or self._turns_tokens(session['turns']) > self.token_budget - summary_budget
+            ):
+                oldest = session['turns'].pop(0)
+                session['summary'] = self._compact(session['summary'], oldest, summary_budget)
+
+            session['updated_at'] = time.time()
+            return session
+
+        try:
+            update = getattr(self.backend, 'update', None)
+            if update is not None:
+                update(user_id, add_turn)
+            else:
+                # Backends without update() may lose a turn under concurrency
+                self.backend.save(user_id, add_turn(self.backend.load(user_id)))
+        except Exception as e:
+            logger.error(f"Error saving chat session: {e}")
+
+    def clear(self, user_id):
+        self.backend.delete(user_id)
+
+    def render(self, session):
+        """Format a session as a prompt block no larger than the token budget"""
+        if not session:
+            return ""
+        lines = []
+        if session.get('summary'):
+            lines.append(f"Earlier: {session['summary']}")
+        for turn in session.get('turns', []):
+            lines.append(f"Student: {turn['student']}")
+            lines.append(f"Advisor: {turn['advisor']}")
+        text = "\n".join(lines)
+        # Over budget only when a single turn is huge; keep its most recent end
+        excess = len(text) - self.token_budget * CHARS_PER_TOKEN
+        return text[excess:] if excess > 0 else text
+
+    def _expired(self, session):
+        return time.time() - session.get('updated_at', 0) > self.idle_ttl
+
+    @staticmethod
+    def _turns_tokens(turns):
+        return sum(estimate_tokens(t['student']) + estimate_tokens(t['advisor']) for t in turns)
+
+    @staticmethod
+    def _compact(summary, turn, budget):
+        # Extractive and local: no LLM call is spent on housekeeping
+        question = truncate_to_tokens(normalize_whitespace(turn['student']), 30)
+        answer = truncate_to_tokens(normalize_whitespace(turn['advisor']), 30)
+        summary = f"{summary} Asked: {question} Told: {answer}".strip()
+        # Rolling: drop the oldest material first once over budget
+        excess = len(summary) - budget * CHARS_PER_TOKEN
+        if excess > 0:
+            summary = summary[excess:]
+            space = summary.find(' ')
+            summary = summary[space + 1:] if space != -1 else summary
+        return summary
@@ -1,7 +1,14 @@
 """
 Course Importer - Web scraping script for Texas State CS catalog
+Each import replaces one catalog namespace; other catalogs are untouched.
+
+Usage:
+    python course_importer.py                           # default catalog (txst-cs)
+    python course_importer.py txst-math                 # URL from CATALOG_SOURCES
+    python course_importer.py txst-math https://mycatalog.txstate.edu/courses/math/
 """
 
+import argparse
 import requests
 from bs4 import BeautifulSoup
 import re
@@ -31,120 +38,140 @@ def extract_prerequisites(html_description):
     
     return prerequisites
 
-def import_courses_from_website(url="https://mycatalog.txstate.edu/courses/cs/"):
-    """Import courses from catalog website"""
+def parse_course_blocks(html):
+    """Parse catalog page HTML into course dicts (code, name, description,
+    department, level, prerequisites)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    course_blocks = soup.find_all('div', class_='courseblock')
+    logger.info(f"Found {len(course_blocks)} course blocks")
+
+    courses_data = []
+
+    for block in course_blocks:
+        try:
+            title_elem = block.find('p', class_='courseblocktitle')
+            if not title_elem:
+                continue
+
+            course_title = title_elem.get_text(strip=True)
+            match = re.match(r'([A-Za-z]+)\s+(\d+[A-Za-z]?)\.?\s+(.*)', course_title)
+            if not match:
+                continue
+
+            dept_code = match.group(1)
+            course_number = match.group(2)
+            course_name = match.group(3)
+
+            desc_elem = block.find('p', class_='courseblockdesc')
+            description = str(desc_elem) if desc_elem else ""
+
+            course_level = 1
+            try:
+                num = int(course_number[:3])
+                if num < 200:
+                    course_level = 1
+                elif num < 300:
+                    course_level = 2
+                elif num < 400:
+                    course_level = 3
+                else:
+                    course_level = 4
+            except:
+                pass
+
+            full_name = f"{dept_code} {course_number}: {course_name}"
+            course_code = f"{dept_code} {course_number}"
+            prereqs = extract_prerequisites(description)
+
+            courses_data.append({
+                'code': course_code,
+                'name': full_name,
+                'description': description,
+                'department': dept_code,
+                'level': course_level,
+                'prerequisites': prereqs
+            })
+
+            logger.info(f"Processed: {course_code}")
+
+        except Exception as e:
+            logger.error(f"Error processing course: {e}")
+
+    return courses_data
+
+def import_courses_from_website(url=None, catalog=None):
+    """Import courses from catalog website into one catalog namespace"""
     from app import app, db
-    from models import Course, CoursePrerequisite
+    from models import Course, CoursePrerequisite, bump_catalog_revision
+    from catalogs import CATALOG_NAME
     
     try:
         with app.app_context():
-            logger.info(f"Fetching courses from {url}")
+            catalog = catalog or app.config['DEFAULT_CATALOG']
+            if not CATALOG_NAME.match(catalog):
+                return {"success": False, "error": f"Invalid catalog name: {catalog}"}
+            url = url or app.config['CATALOG_SOURCES'].get(catalog)
+            if not url:
+                return {"success": False, "error": f"No source URL configured for catalog {catalog}"}
+
+            logger.info(f"Fetching {catalog} courses from {url}")
             response = requests.get(url)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            course_blocks = soup.find_all('div', class_='courseblock')
-            logger.info(f"Found {len(course_blocks)} course blocks")
-            
-            courses_data = []
-            
-            for block in course_blocks:
-                try:
-                    title_elem = block.find('p', class_='courseblocktitle')
-                    if not title_elem:
-                        continue
-                    
-                    course_title = title_elem.get_text(strip=True)
-                    match = re.match(r'([A-Za-z]+)\s+(\d+[A-Za-z]?)\.?\s+(.*)', course_title)
-                    if not match:
-                        continue
-                    
-                    dept_code = match.group(1)
-                    course_number = match.group(2)
-                    course_name = match.group(3)
-                    
-                    desc_elem = block.find('p', class_='courseblockdesc')
-                    description = str(desc_elem) if desc_elem else ""
-                    
-                    course_level = 1
-                    try:
-                        num = int(course_number[:3])
-                        if num < 200:
-                            course_level = 1
-                        elif num < 300:
-                            course_level = 2
-                        elif num < 400:
-                            course_level = 3
-                        else:
-                            course_level = 4
-                    except:
-                        pass
-
-                    full_name = f"{dept_code} {course_number}: {course_name}"
-                    course_code = f"{dept_code} {course_number}"
-                    prereqs = extract_prerequisites(description)
-                    
-                    courses_data.append({
-                        'code': course_code,
-                        'name': full_name,
-                        'description': description,
-                        'department': dept_code,
-                        'level': course_level,
-                        'prerequisites': prereqs
-                    })
-                    
-                    logger.info(f"Processed: {course_code}")
-                
-                except Exception as e:
-                    logger.error(f"Error processing course: {e}")
+            courses_data = parse_course_blocks(response.text)
             
-            # Clear existing data
-            db.session.query(CoursePrerequisite).delete()
-            db.session.query(Course).delete()
-            db.session.commit()
-            
-            # Insert courses
-            course_ids = {}
-            for course_data in courses_data:
-                course = Course(
-                    name=course_data['name'],
-                    description=course_data['description'],
-                    department=course_data['department'],
-                    level=course_data['level']
-                )
-                db.session.add(course)
+            # Replace the catalog in a single transaction: readers see the old
+            # catalog until the commit, then the new one, never a half-import
+            try:
+                catalog_ids = db.select(Course.id).where(Course.catalog == catalog)
+                db.session.query(CoursePrerequisite).filter(
+                    CoursePrerequisite.course_id.in_(catalog_ids) | CoursePrerequisite.prerequisite_id.in_(catalog_ids)
+                ).delete(synchronize_session=False)
+                db.session.query(Course).filter(Course.catalog == catalog).delete(synchronize_session=False)
+
+                # Insert courses; one flush assigns all their ids
+                courses = []
+                for course_data in courses_data:
+                    course = Course(
+                        catalog=catalog,
+                        name=course_data['name'],
+                        department=course_data['department'],
+                        level=course_data['level']
+                    )
+                    course.set_description(course_data['description'])
+                    courses.append((course_data['code'], course))
+                db.session.add_all(course for _, course in courses)
                 db.session.flush()
-                course_ids[course_data['code']] = course.id
-            
-            db.session.commit()
-            
-            # Create prerequisite relationships (avoid duplicates)
-            prereq_pairs = set()  # Track (course_id, prerequisite_id) pairs
-            for course_data in courses_data:
-                course_id = course_ids[course_data['code']]
-                for prereq_code in course_data['prerequisites']:
-                    if prereq_code in course_ids:
-                        prereq_id = course_ids[prereq_code]
-                        pair = (course_id, prereq_id)
-                        
-                        # Only add if not already added
-                        if pair not in prereq_pairs:
-                            prereq_relation = CoursePrerequisite(
-                                course_id=course_id,
-                                prerequisite_id=prereq_id
-                            )
-                            db.session.add(prereq_relation)
-                            prereq_pairs.add(pair)
-            
-            db.session.commit()
+                course_ids = {code: course.id for code, course in courses}
+
+                # Create prerequisite relationships (avoid duplicates)
+                prereq_pairs = set()  # Track (course_id, prerequisite_id) pairs
+                for course_data in courses_data:
+                    course_id = course_ids[course_data['code']]
+                    for prereq_code in course_data['prerequisites']:
+                        if prereq_code in course_ids:
+                            prereq_id = course_ids[prereq_code]
+                            prereq_pairs.add((course_id, prereq_id))
+                db.session.add_all(
+                    CoursePrerequisite(course_id=course_id, prerequisite_id=prereq_id)
+                    for course_id, prereq_id in sorted(prereq_pairs)
+                )
+
+                # Running app processes pick the new catalog up on their next check
+                bump_catalog_revision(catalog)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
             
-            course_count = db.session.query(Course).count()
-            prereq_count = db.session.query(CoursePrerequisite).count()
+            course_count = len(course_ids)
+            prereq_count = len(prereq_pairs)
             
-            logger.info(f"✅ Imported {course_count} courses, {prereq_count} prerequisites")
+            logger.info(f"✅ Imported {course_count} courses, {prereq_count} prerequisites into {catalog}")
             
             return {
                 "success": True,
+                "catalog": catalog,
                 "course_count": course_count,
                 "prerequisite_count": prereq_count
             }
@@ -154,7 +181,12 @@ def import_courses_from_website(url="https://mycatalog.txstate.edu/courses/cs/")
         return {"success": False, "error": str(e)}
 
 if __name__ == "__main__":
-    result = import_courses_from_website()
+    parser = argparse.ArgumentParser(description="Import a course catalog into its own namespace")
+    parser.add_argument('catalog', nargs='?', help="catalog name, e.g. txst-cs (default: DEFAULT_CATALOG)")
+    parser.add_argument('url', nargs='?', help="catalog page URL (default: from CATALOG_SOURCES)")
+    args = parser.parse_args()
+
+    result = import_courses_from_website(url=args.url, catalog=args.catalog)
     if result["success"]:
         print(f"✅ Successfully imported {result['course_count']} courses")
     else:
@@ -0,0 +1,160 @@
+"""
+Curriculum Analytics - Per-course metrics over the prerequisite graph
+Computed once when JourneyMap builds its graph and kept in compact numpy
+arrays, so the graph API and the bottleneck ranking do no graph work per
+request.
+
+Metrics per course:
+    depth           longest prerequisite chain leading to the course (0 = no prerequisites)
+    prereq_count    courses that come before it, directly or transitively
+    unlock_count    courses it leads to, directly or transitively
+    direct_unlocks  courses that list it as a direct prerequisite
+    path_to_senior  longest chain from the course to a senior (level 4) course, -1 if none
+    bottleneck      share of all entry-to-terminal prerequisite paths that run through it
+"""
+
+import numpy as np
+import networkx as nx
+
+SENIOR_LEVEL = 4
+METRICS = ('depth', 'prereq_count', 'unlock_count', 'direct_unlocks', 'path_to_senior', 'bottleneck')
+
+
+class CurriculumAnalytics:
+    """Metric arrays aligned with an array of course ids"""
+
+    def __init__(self, ids, arrays):
+        self.ids = ids
+        self.arrays = arrays
+        self._index = {int(course_id): i for i, course_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def compute(cls, graph):
+        """Analyze a prerequisite DiGraph (edges prerequisite -> course).
+
+        Prerequisite cycles (catalog errors) are collapsed into their strongly
+        connected components first, so every pass runs on a DAG. Depth, path
+        lengths and path counts are single linear passes in topological order;
+        transitive counts OR together Python-int bitsets, each freed as soon as
+        its last predecessor has consumed it.
+        """
+        nodes = list(graph.nodes)
+        n = len(nodes)
+        ids = np.array(nodes, dtype=np.int64)
+        if n == 0:
+            return cls(ids, {name: np.zeros(0) for name in METRICS})
+
+        index = {node: i for i, node in enumerate(nodes)}
+        try:
+            order = [index[node] for node in nx.topological_sort(graph)]
+            k = n
+            component = np.arange(n)
+            succ = [[index[s] for s in graph.successors(node)] for node in nodes]
+            pred = [[index[p] for p in graph.predecessors(node)] for node in nodes]
+            members = list(range(n))
+        except nx.NetworkXUnfeasible:
+            condensed = nx.condensation(graph)
+            mapping = condensed.graph['mapping']
+            k = condensed.number_of_nodes()
+            order = list(nx.topological_sort(condensed))
+            component = np.fromiter((mapping[node] for node in nodes), dtype=np.int64, count=n)
+            succ = [list(condensed.successors(c)) for c in range(k)]
+            pred = [list(condensed.predecessors(c)) for c in range(k)]
+            # Bit positions of each component's members; a list only for cycles
+            members = [[index[node] for node in condensed.nodes[c]['members']] for c in range(k)]
+            members = [m if len(m) > 1 else m[0] for m in members]
+
+        size = np.bincount(component, minlength=k)
+        senior = [False] * k
+        for node, data in graph.nodes(data=True):
+            c = component[index[node]]
+            senior[c] = senior[c] or (data.get('level') or 0) >= SENIOR_LEVEL
+
+        # Plain lists: per-element numpy access is slow in these Python loops
+        depth = [0] * k
+        paths_in = [1.0] * k
+        for c in order:
+            if pred[c]:
+                depth[c] = max(depth[p] for p in pred[c]) + 1
+                paths_in[c] = sum(paths_in[p] for p in pred[c])
+
+        to_senior = [-1] * k
+        paths_out = [1.0] * k
+        for c in reversed(order):
+            best = 0 if senior[c] else -1
+            for s in succ[c]:
+                if to_senior[s] >= 0 and to_senior[s] + 1 > best:
+                    best = to_senior[s] + 1
+            to_senior[c] = best
+            if succ[c]:
+                paths_out[c] = sum(paths_out[s] for s in succ[c])
+
+        unlocks = cls._reach_counts(reversed(order), succ, pred, members, k)
+        prereqs = cls._reach_counts(order, pred, succ, members, k)
+
+        total_paths = sum(paths_out[c] for c in range(k) if not pred[c])
+        with np.errstate(over='ignore', invalid='ignore'):
+            bottleneck = np.nan_to_num(np.array(paths_in) * np.array(paths_out) / total_paths)
+
+        # Members of a cycle reach each other, so they count as well
+        cycle_peers = size[component] - 1
+        arrays = {
+            'depth': np.array(depth, dtype=np.int32)[component],
+            'prereq_count': (prereqs[component] + cycle_peers).astype(np.int32),
+            'unlock_count': (unlocks[component] + cycle_peers).astype(np.int32),
+            'direct_unlocks': np.fromiter((graph.out_degree(node) for node in nodes), dtype=np.int32, count=n),
+            'path_to_senior': np.array(to_senior, dtype=np.int32)[component],
+            'bottleneck': bottleneck[component],
+        }
+        return cls(ids, arrays)
+
+    @staticmethod
+    def _reach_counts(order, forward, backward, members, k):
+        """Number of nodes reachable along `forward` edges from each component"""
+        counts = np.zeros(k, dtype=np.int64)
+        reach = [None] * k
+        pending = [len(backward[c]) for c in range(k)]  # consumers still to read reach[c]
+        for c in order:
+            bits = 0
+            for nxt in forward[c]:
+                bits |= reach[nxt]
+                if isinstance(members[nxt], list):
+                    for position in members[nxt]:
+                        bits |= 1 << position
+                else:
+                    bits |= 1 << members[nxt]
+                pending[nxt] -= 1
+                if pending[nxt] == 0:
+                    reach[nxt] = None
+            counts[c] = bits.bit_count()
+            if pending[c]:
+                reach[c] = bits
+        return counts
+
+    def for_course(self, course_id):
+        """Metrics of one course as plain Python values, or None if unknown"""
+        i = self._index.get(course_id)
+        if i is None:
+            return None
+        return self._row(i)
+
+    def ranked(self, metric='bottleneck', limit=10):
+        """(course_id, metrics) pairs, highest value of `metric` first"""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        values = self.arrays[metric]
+        limit = min(limit, len(values))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-values, limit - 1)[:limit]
+        # Ties go to the course that unlocks more
+        top = top[np.lexsort((-self.arrays['unlock_count'][top], -values[top]))]
+        return [(int(self.ids[i]), self._row(i)) for i in top]
+
+    def _row(self, i):
+        row = {name: int(self.arrays[name][i]) for name in METRICS if name != 'bottleneck'}
+        row['bottleneck'] = round(float(self.arrays['bottleneck'][i]), 6)
+        return row
@@ -5,3 +5,62 @@ Flask extensions initialization
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
+
+
+def normalize_database_url(url):
+    """Pin PostgreSQL URLs to the psycopg2 driver in requirements.txt.
+
+    Heroku-style postgres:// URLs are not accepted by SQLAlchemy 2, and a
+    bare postgresql:// means psycopg 3 from SQLAlchemy 2.1 on.
+    """
+    for scheme in ('postgres://', 'postgresql://'):
+        if url and url.startswith(scheme):
+            return 'postgresql+psycopg2://' + url[len(scheme):]
+    return url
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database.
+
+    Server databases get a bounded, health-checked connection pool; SQLite
+    keeps SQLAlchemy's default pool and is tuned per connection in init_db.
+    """
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+
+def init_db(app):
+    """Bind db to the app, applying the SQLite PRAGMA profile to file databases.
+
+    WAL lets readers keep going while the importer writes, busy_timeout makes
+    writers wait for each other instead of failing, and synchronous=NORMAL
+    is durable enough under WAL at a fraction of the fsyncs.
+    """
+    db.init_app(app)
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+
+    from sqlalchemy import event
+
+    pragmas = (
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA busy_timeout={int(app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+        f"PRAGMA mmap_size={int(app.config.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))}",
+        "PRAGMA synchronous=NORMAL",
+    )
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'connect')
+    def _tune_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
@@ -0,0 +1,73 @@
+"""
+Gunicorn configuration - build once in the master, share it with every worker
+With preload_app the master imports app.py, so the course graph, analytics,
+TF-IDF model and retrieval index are built a single time and inherited by
+each forked worker as copy-on-write pages. Workers then only pay for what
+they touch after the fork, which means more workers per box and near
+instant respawns.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Set GUNICORN_PRELOAD=0 to fall back to building the app in every worker.
+Workers (WEB_CONCURRENCY) and bind address (PORT) are read by gunicorn itself.
+Workers share metrics through METRICS_DIR, so /metrics totals every worker.
+"""
+
+import gc
+import os
+import time
+import shutil
+
+METRICS_DIR = os.environ.setdefault(
+    'METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics')
+)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+if preload_app:
+    # No collections while the app is built: the cyclic GC writes to every
+    # object header it visits, which would unshare the pages after fork
+    gc.disable()
+
+
+def on_starting(server):
+    # Totals restart with the server; files of exited workers are kept until then
+    shutil.rmtree(METRICS_DIR, ignore_errors=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+
+def pre_fork(server, worker):
+    worker.fork_started = time.perf_counter()
+    if preload_app:
+        # Move everything built so far out of the collector's reach for good
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+        # Connections opened by the master while building must not be shared
+        from app import app
+        from extensions import db
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    import metrics
+    from app import app
+    # Job worker threads belong to serving processes only (and threads do not survive fork)
+    app.jobs.start()
+    seconds = time.perf_counter() - worker.fork_started
+    metrics.record_boot('worker', seconds)
+    memory = metrics.process_memory()
+    shared = f", shared {memory['shared'] / 2**20:.0f} MB" if 'shared' in memory else ""
+    worker.log.info(
+        f"Worker {worker.pid} ready in {seconds:.2f}s (rss {memory['rss'] / 2**20:.0f} MB{shared})"
+    )
+
+
+def worker_exit(server, worker):
+    import metrics
+    metrics.flush()
@@ -0,0 +1,111 @@
+"""
+Intent Router - Spots factual catalog questions that need no LLM
+Questions whose answer is fully determined by the catalog (a course's
+prerequisites, what it unlocks, what a course is, which courses cover a
+topic) are recognised here and answered by the advisor straight from the
+graph and indexes. Anything open-ended returns None and goes to Gemini.
+"""
+
+import re
+from collections import namedtuple
+
+PREREQUISITES = 'prerequisites'
+UNLOCKS = 'unlocks'
+LOOKUP = 'lookup'
+TOPIC_LIST = 'topic_list'
+
+Intent = namedtuple('Intent', ['kind', 'course_ids', 'topics'])
+
+# Advice, planning and opinion need the LLM even when they name a course
+_OPEN_ENDED_RE = re.compile(
+    r"\b(should|recommend\w*|suggest\w*|best|better|worth|easiest|hardest|career|job|advice|"
+    r"plan\w*|schedule|compare|versus|vs|difference|why|how (do|can|should)|resume|interested|"
+    r"want to|help me|my)\b",
+    re.IGNORECASE
+)
+# The patterns below run on the message with course codes replaced by "@"
+# (see _normalize), so each one names the course as its subject. Anything
+# that merely mentions requirements ("does @ require a lot of math?") is
+# left to the LLM.
+_PREREQ_WORD = r"(prereq\w*|pre-req\w*)"
+# "is @ a prerequisite for @" asks what the first course unlocks
+_NOT_AFTER_COURSE = r"(?<!@ )(?<!@ a )(?<!@ an )(?<!@ is )"
+_PREREQ_RE = re.compile(
+    rf"\b{_NOT_AFTER_COURSE}{_PREREQ_WORD}( (for|of|to take|to))?:? @|"
+    rf"@('s|s')? {_PREREQ_WORD}|"
+    rf"\bdoes @ have (any )?{_PREREQ_WORD}|"
+    rf"\b(its|their) {_PREREQ_WORD}|"
+    rf"\b(what are|list|show( me)?) (the )?{_PREREQ_WORD}$|"
+    r"\brequirements? (for|of|to take) @|"
+    rf"\b{_NOT_AFTER_COURSE}(required|needed|necessary) (for|before|to take) @|"
+    r"\bneed (to (take|have|complete) )?before (taking |i can take |you can take )?@|"
+    r"\bwhat do (i|you|students) need (in order )?to take @|"
+    r"\bwhat (courses?|classes?) (comes?|go|are taken) before @"
+)
+# Checked after _PREREQ_RE: the course comes before the verb ("is @ a
+# prerequisite for @") or the question ends on "for" ("what is @ required for")
+_UNLOCK_RE = re.compile(
+    r"\b(unlock\w*|leads? (in)?to|opens? up|after (taking|completing|finishing|passing)|"
+    r"what comes after|take after|take next|next courses?)\b|"
+    rf"@ (is |are )?(a |an )?({_PREREQ_WORD}|required|needed) (for|to)\b|"
+    rf"\b({_PREREQ_WORD}|required|needed) (for|to)( (what|which)\b.*)?$"
+)
+_LOOKUP_FIELD = r"(name|title|description|level|course level|credits?|credit hours|hours)"
+# A lookup is the whole question: one of these forms about the course(s), nothing more
+_LOOKUP_RE = re.compile(
+    r"(please )?("
+    r"@|"
+    r"(what(\s+is|'s)|tell me about|describe|info(rmation)? (on|about)|details (on|of|for)) @|"
+    r"what does @ cover|"
+    rf"what('s| is| are) (the )?{_LOOKUP_FIELD} (of|for) @|"
+    rf"what('s| is| are) @('s|s') {_LOOKUP_FIELD}|"
+    r"what level is @|"
+    r"how many (credits?|credit hours|hours) (is|are|does) @( (have|carry|give|count for|worth))?"
+    r")"
+)
+_CODE_RE = re.compile(r"\b[A-Za-z]{2,4}\s?-?\d{4}[A-Za-z]?\b")
+_TOPIC_LIST_RE = re.compile(
+    r"\b(which|what|list|show|any|are there)\b.{0,40}\b(courses?|classes?)\b|"
+    r"\b(courses?|classes?) (on|about|in|covering|for|that cover|related to)\b",
+    re.IGNORECASE
+)
+
+
+def _normalize(message):
+    """Lowercase, course codes (and lists of them) as "@", no trailing punctuation"""
+    text = _CODE_RE.sub("@", message.lower())
+    text = re.sub(r"@((\s*,\s*|\s+)(and|or|&)?\s*@)+", "@", text)
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" \t\n?.!")
+
+
+def classify(message, topic_matcher):
+    """Return the Intent of a factual catalog question, or None to use the LLM"""
+    if not message or _OPEN_ENDED_RE.search(message):
+        return None
+
+    terms = topic_matcher.match(message)
+    course_ids = []
+    topics = []
+    for term in terms:
+        course_id = topic_matcher.resolve_code(term)
+        if course_id is not None:
+            if course_id not in course_ids:
+                course_ids.append(course_id)
+        elif not any(ch.isdigit() for ch in term):
+            topics.append(term)
+
+    if course_ids:
+        normalized = _normalize(message)
+        if _PREREQ_RE.search(normalized):
+            return Intent(PREREQUISITES, course_ids, topics)
+        if _UNLOCK_RE.search(normalized):
+            return Intent(UNLOCKS, course_ids, topics)
+        # "tell me about CS 4380", "how many credits is CS 4380", or just "CS 4380?"
+        if _LOOKUP_RE.fullmatch(normalized):
+            return Intent(LOOKUP, course_ids, topics)
+        return None
+
+    if topics and _TOPIC_LIST_RE.search(message):
+        return Intent(TOPIC_LIST, [], topics)
+    return None
@@ -0,0 +1,358 @@
+"""
+Job Queue - SQLite-backed background jobs with a local worker pool
+Slow work (resume analysis) is queued by the web request and run by a small
+pool of worker threads, so HTTP workers return immediately and clients poll
+for the result. Jobs are retried with backoff, and a job whose worker died
+is picked up again once its lease expires, until its attempts run out.
+
+The pool is started by the serving entry points only (gunicorn workers,
+`python app.py`), never by scripts that merely import the app. It can also
+run on its own, on the same host since the queue and its attachments are
+local files, with JOB_WORKERS=0 on the web side:
+
+    python job_queue.py
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import sqlite3
+import threading
+
+from metrics import REGISTRY, count_error
+
+logger = logging.getLogger('job_queue')
+
+JOB_RUNS = REGISTRY.counter('jobs_total', 'Background job attempts by kind and outcome')
+JOB_LATENCY = REGISTRY.histogram('job_duration_seconds', 'Background job run time by kind')
+JOB_WAIT = REGISTRY.histogram('job_queue_wait_seconds', 'Time jobs spent queued before a worker took them')
+
+FINISHED = ('succeeded', 'failed')
+LEASE_EXPIRED_ERROR = "The job stopped responding (lease expired) too many times. Please try again later."
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix"""
+
+
+class JobQueue:
+    """Persistent queue plus the worker threads that drain it"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.path = None
+        self.directory = None
+        self.workers = 2
+        self.max_attempts = 3
+        self.retry_delay = 5.0
+        self.lease = 300.0
+        self.result_ttl = 3600.0
+        self.poll_interval = 1.0
+        self.autostart = False
+        self._handlers = {}
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        config = app.config
+        self.path = config.get('JOB_DB') or os.path.join(app.instance_path, 'jobs.db')
+        self.directory = config.get('JOB_DIR') or os.path.join(app.instance_path, 'jobs')
+        self.workers = config.get('JOB_WORKERS', self.workers)
+        self.max_attempts = config.get('JOB_MAX_ATTEMPTS', self.max_attempts)
+        self.retry_delay = config.get('JOB_RETRY_DELAY', self.retry_delay)
+        self.lease = config.get('JOB_LEASE_SECONDS', self.lease)
+        self.result_ttl = config.get('JOB_RESULT_TTL', self.result_ttl)
+        self.autostart = config.get('JOB_AUTOSTART', self.autostart)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, run_at REAL NOT NULL, "
+            "lease_until REAL, result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_ready ON jobs (status, run_at)")
+
+        REGISTRY.gauge_callback(
+            'jobs_pending', 'Queued and running background jobs',
+            lambda: [({'status': status}, count) for status, count in self.counts().items()]
+        )
+        # Opt-in: short-lived scripts importing the app must not claim jobs and exit mid-run
+        if self.autostart:
+            self.start()
+
+    def register(self, kind, handler):
+        """handler(payload, attachment_path) returns a JSON-serializable result.
+
+        Workers only claim jobs of registered kinds.
+        """
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind, payload, attachment=None):
+        """Queue a job and return its id.
+
+        attachment is an optional file handed to the handler: bytes, or the
+        path of a file to move into the job directory. It is deleted once
+        the job finishes.
+        """
+        job_id = uuid.uuid4().hex
+        if attachment is not None:
+            destination = self._attachment_path(job_id)
+            if isinstance(attachment, (bytes, bytearray)):
+                fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(attachment)
+            else:
+                shutil.move(attachment, destination)
+
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, max_attempts, run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), self.max_attempts, now, now, now)
+            )
+        JOB_RUNS.inc(kind=kind, outcome='queued')
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Public view of a job: status, attempts, and the result or error once finished"""
+        row = self._connect().execute(
+            "SELECT id, kind, status, attempts, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "attempts": row[3],
+            "created_at": row[6],
+            "updated_at": row[7]
+        }
+        if row[4] is not None:
+            job["result"] = json.loads(row[4])
+        if row[5] is not None:
+            job["error"] = row[5]
+        return job
+
+    def counts(self):
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+        ).fetchall()
+        return {'queued': 0, 'running': 0, **dict(rows)}
+
+    def start(self):
+        """Start this process's worker threads, once per process (safe after fork)"""
+        if self.workers <= 0:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            logger.info(f"Started {self.workers} job workers in process {self._pid}")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_once(self):
+        """Claim and run one ready job; returns False when there was nothing to do"""
+        job = self._claim()
+        if job is None:
+            return False
+        self._run(*job)
+        return True
+
+    def purge(self):
+        """Delete finished jobs (and any leftover attachments) past the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        with self._transaction() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,)
+            )]
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,)
+            )
+        for job_id in expired:
+            self._remove_attachment(job_id)
+        return len(expired)
+
+    def _work(self):
+        last_purge = 0
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+                if time.time() - last_purge > 60:
+                    self.purge()
+                    last_purge = time.time()
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                count_error('job_queue.worker', e)
+            # Jobs queued by other processes are found on the next poll
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self):
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        now = time.time()
+        in_kinds = f"kind IN ({', '.join('?' * len(kinds))})"
+        with self._transaction() as conn:
+            # A lease expiring on the last attempt means the job kills its worker: give up on it
+            abandoned = conn.execute(
+                f"SELECT id, kind FROM jobs WHERE status = 'running' AND lease_until < ? "
+                f"AND attempts >= max_attempts AND {in_kinds}",
+                (now, *kinds)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                [(LEASE_EXPIRED_ERROR, now, job_id) for job_id, _ in abandoned]
+            )
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts, max_attempts, created_at FROM jobs "
+                "WHERE ((status = 'queued' AND run_at <= ?) "
+                f"OR (status = 'running' AND lease_until < ? AND attempts < max_attempts)) AND {in_kinds} "
+                "ORDER BY run_at LIMIT 1",
+                (now, now, *kinds)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (now + self.lease, now, row[0])
+                )
+        for job_id, kind in abandoned:
+            logger.error(f"Job {job_id} ({kind}) lease expired on its last attempt; marking it failed")
+            JOB_RUNS.inc(kind=kind, outcome='failed')
+            self._remove_attachment(job_id)
+        if row is None:
+            return None
+        job_id, kind, payload, attempts, max_attempts, created_at = row
+        if attempts == 0:
+            JOB_WAIT.observe(now - created_at, kind=kind)
+        return job_id, kind, json.loads(payload), attempts + 1, max_attempts
+
+    def _run(self, job_id, kind, payload, attempt, max_attempts):
+        handler = self._handlers.get(kind)
+        if handler is None:
+            self._finish(job_id, 'failed', error=f"No handler for job kind {kind}")
+            return
+
+        attachment = self._attachment_path(job_id)
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                result = handler(payload, attachment if os.path.exists(attachment) else None)
+        except PermanentJobError as e:
+            JOB_RUNS.inc(kind=kind, outcome='failed')
+            self._finish(job_id, 'failed', error=str(e))
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) attempt {attempt}/{max_attempts} failed: {e}")
+            count_error(f'job.{kind}', e)
+            if attempt >= max_attempts:
+                JOB_RUNS.inc(kind=kind, outcome='failed')
+                self._finish(job_id, 'failed', error="The job failed after several attempts. Please try again later.")
+            else:
+                JOB_RUNS.inc(kind=kind, outcome='retry')
+                self._retry(job_id, self.retry_delay * 2 ** (attempt - 1))
+        else:
+            JOB_RUNS.inc(kind=kind, outcome='succeeded')
+            self._finish(job_id, 'succeeded', result=result)
+        finally:
+            JOB_LATENCY.observe(time.perf_counter() - start, kind=kind)
+
+    def _retry(self, job_id, delay):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (now + delay, now, job_id)
+            )
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+        self._remove_attachment(job_id)
+
+    def _attachment_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.bin")
+
+    def _remove_attachment(self, job_id):
+        try:
+            os.remove(self._attachment_path(job_id))
+        except OSError:
+            pass
+
+    def _connect(self):
+        # One connection per thread, reopened in forked children
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connect())
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE so two workers never claim the same job"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+if __name__ == '__main__':
+    # Standalone worker: same queue and handlers as the web app, no HTTP
+    os.environ.setdefault('JOB_WORKERS', '0')
+    from app import app
+
+    queue = app.jobs
+    queue.workers = int(os.environ.get('JOB_STANDALONE_WORKERS', 2))
+    queue.start()
+    logger.info(f"Job worker running with {queue.workers} threads; Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        queue.stop()
@@ -1,18 +1,24 @@
 import logging
 import networkx as nx
+from metrics import timed, stage
+from curriculum_analytics import CurriculumAnalytics
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('journey_map')
 
+SUBGRAPH_DIRECTIONS = ('prerequisites', 'unlocks', 'both')
+
 class JourneyMap:
     """Creates journey maps for CS courses with NetworkX graph visualization"""
     
-    def __init__(self, app=None):
+    def __init__(self, app=None, catalog=None):
         self.app = app
+        self.catalog = catalog  # None graphs every catalog
         self.db = None
         self.Course = None
         self.course_graph = None
         self.course_levels = {}
+        self.analytics = CurriculumAnalytics.compute(nx.DiGraph())
         
         if app is not None:
             self.init_app(app)
@@ -29,6 +35,7 @@ class JourneyMap:
             self.build_course_graph()
         logger.info("JourneyMap initialized")
 
+    @timed('journey_map', 'build_course_graph')
     def build_course_graph(self):
         """Build directed graph of courses with prerequisites"""
         if not self.app:
@@ -36,7 +43,10 @@ class JourneyMap:
 
         try:
             with self.app.app_context():
-                courses = self.Course.query.all()
+                query = self.Course.query
+                if self.catalog is not None:
+                    query = query.filter_by(catalog=self.catalog)
+                courses = query.all()
                 if not courses:
                     logger.warning("No courses found")
                     return False
@@ -52,10 +62,17 @@ class JourneyMap:
                     self.course_levels[course.id] = course.level or 1
                 
                 from models import CoursePrerequisite
-                prereqs = CoursePrerequisite.query.all()
-                for prereq in prereqs:
+                prereqs = CoursePrerequisite.query
+                if self.catalog is not None:
+                    prereqs = prereqs.join(self.Course, self.Course.id == CoursePrerequisite.course_id).filter(
+                        self.Course.catalog == self.catalog
+                    )
+                for prereq in prereqs.all():
                     G.add_edge(prereq.prerequisite_id, prereq.course_id, relationship="prerequisite")
                 
+                # Analytics are tied to this graph; they are recomputed only when it is rebuilt
+                with stage('journey_map', 'analytics'):
+                    self.analytics = CurriculumAnalytics.compute(G)
                 self.course_graph = G
                 logger.info(f"Graph built: {len(G.nodes)} nodes, {len(G.edges)} edges")
                 return True
@@ -64,6 +81,7 @@ class JourneyMap:
             logger.error(f"Error building graph: {e}")
             return False
     
+    @timed('journey_map', 'get_course_graph_data')
     def get_course_graph_data(self):
         """Return graph in JSON format for visualization"""
         try:
@@ -76,6 +94,7 @@ class JourneyMap:
                 node_data = {"id": node_id}
                 node_data.update(node_attrs)
                 node_data["level"] = self.course_levels.get(node_id, 1)
+                node_data.update(self.analytics.for_course(node_id) or {})
                 graph_data["nodes"].append(node_data)
             
             for u, v, edge_attrs in self.course_graph.edges(data=True):
@@ -89,53 +108,86 @@ class JourneyMap:
             logger.error(f"Error generating graph data: {e}")
             return {"nodes": [], "links": []}
     
+    @timed('journey_map', 'get_prerequisite_chain')
     def get_prerequisite_chain(self, course_id):
         """Get full prerequisite chain for a course"""
         try:
             if not self.course_graph or course_id not in self.course_graph.nodes:
                 return {"nodes": [], "links": []}
-            
-            prereq_nodes = set()
-            prereq_edges = set()
-            queue = [course_id]
-            visited = set()
-
-            while queue:
-                current = queue.pop(0)
-                if current in visited:
-                    continue
-                visited.add(current)
-                
-                predecessors = list(self.course_graph.predecessors(current))
-                for prereq in predecessors:
-                    prereq_nodes.add(prereq)
-                    prereq_edges.add((prereq, current))
-                    if prereq not in visited:
-                        queue.append(prereq)
-
-            prereq_nodes.add(course_id)
-            
-            chain_data = {"nodes": [], "links": []}
-            for node_id in prereq_nodes:
-                node_attrs = self.course_graph.nodes[node_id]
-                node_data = {"id": node_id}
-                node_data.update(node_attrs)
-                chain_data["nodes"].append(node_data)
-            
-            for src, dst in prereq_edges:
-                edge_attrs = self.course_graph.edges[src, dst]
-                chain_data["links"].append({
-                    "source": src,
-                    "target": dst,
-                    "relationship": edge_attrs.get('relationship', 'prerequisite')
-                })
-            
-            return chain_data
-            
+            chain_data = self.get_subgraph([course_id], direction='prerequisites')
+            return {"nodes": chain_data["nodes"], "links": chain_data["links"]}
         except Exception as e:
             logger.error(f"Error getting prerequisite chain: {e}")
             return {"nodes": [], "links": []}
-    
+
+    @timed('journey_map', 'get_subgraph')
+    def get_subgraph(self, course_ids, direction='both', max_depth=None):
+        """Merged chains of several courses in one deduplicated subgraph.
+
+        direction is 'prerequisites' (what each course requires), 'unlocks'
+        (what each course leads to) or 'both'; max_depth limits how many
+        prerequisite steps are followed from the requested courses.
+        """
+        if direction not in SUBGRAPH_DIRECTIONS:
+            raise ValueError(f"Unknown direction: {direction}")
+        if max_depth is not None and max_depth < 0:
+            raise ValueError("max_depth must be zero or positive")
+
+        graph = self.course_graph
+        if graph is None:
+            return {"nodes": [], "links": [], "roots": [], "missing": sorted(set(course_ids))}
+        roots = {course_id for course_id in course_ids if course_id in graph}
+        missing = sorted(set(course_ids) - roots)
+
+        nodes = set(roots)
+        edges = set()
+        if direction in ('prerequisites', 'both'):
+            self._expand(roots, graph.predecessors, max_depth, nodes, edges, backward=True)
+        if direction in ('unlocks', 'both'):
+            self._expand(roots, graph.successors, max_depth, nodes, edges, backward=False)
+
+        subgraph = {"nodes": [], "links": [], "roots": sorted(roots), "missing": missing}
+        for node_id in nodes:
+            node_data = {"id": node_id}
+            node_data.update(graph.nodes[node_id])
+            subgraph["nodes"].append(node_data)
+        for src, dst in edges:
+            subgraph["links"].append({
+                "source": src,
+                "target": dst,
+                "relationship": graph.edges[src, dst].get('relationship', 'prerequisite')
+            })
+        return subgraph
+
+    @staticmethod
+    def _expand(roots, neighbors, max_depth, nodes, edges, backward):
+        """Level-by-level traversal from all roots at once; each node is expanded once"""
+        seen = set(roots)
+        frontier = seen
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            next_frontier = set()
+            for node in frontier:
+                for other in neighbors(node):
+                    edges.add((other, node) if backward else (node, other))
+                    if other not in seen:
+                        next_frontier.add(other)
+            seen |= next_frontier
+            frontier = next_frontier
+            depth += 1
+        nodes |= seen
+
+    @timed('journey_map', 'get_bottlenecks')
+    def get_bottlenecks(self, metric='bottleneck', limit=10):
+        """Courses ranked by a precomputed analytics metric (see curriculum_analytics.py)"""
+        courses = []
+        for course_id, metrics in self.analytics.ranked(metric, limit):
+            attrs = self.course_graph.nodes[course_id]
+            course = {"id": course_id, "name": attrs.get('name'), "level": attrs.get('level')}
+            course.update(metrics)
+            courses.append(course)
+        return {"metric": metric, "courses": courses}
+
     def get_career_pathways(self):
         """Return course progression pathways for careers"""
         return []  # Simplified for deployment
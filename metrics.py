@@ -0,0 +1,425 @@
+"""
+Metrics - Lightweight in-process metrics with a Prometheus text exposition
+Per-route and per-stage latency histograms, LLM token/error counters, cache
+hit rates and DB query counts. Each worker process keeps its own registry.
+
+With METRICS_DIR set (gunicorn.conf.py does this), every worker also writes
+its counters and histograms to that directory, and /metrics serves the sum
+over all workers, so scrapes that land on different workers agree (other
+workers' numbers lag by up to METRICS_FLUSH_INTERVAL). Gauges stay per
+process and carry a pid label where it matters.
+"""
+
+import os
+import hmac
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+from flask import g, has_request_context, request, Response, abort
+
+logger = logging.getLogger('metrics')
+
+# Seconds; spans sub-millisecond lookups up to long LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter, optionally labelled"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def state(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def collect(self, others=()):
+        """Samples of this process plus the state() of other processes"""
+        with self._lock:
+            values = dict(self._values)
+        for state in others:
+            for key, value in state:
+                key = tuple(tuple(pair) for pair in key)
+                values[key] = values.get(key, 0) + value
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram:
+    """Bucketed distribution of observations, optionally labelled"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def state(self):
+        with self._lock:
+            return [[list(key), [list(counts), total, count]] for key, (counts, total, count) in self._values.items()]
+
+    def collect(self, others=()):
+        """Samples of this process plus the state() of other processes"""
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for state in others:
+            for key, (counts, total, count) in state:
+                key = tuple(tuple(pair) for pair in key)
+                mine = values.get(key)
+                if mine is not None:
+                    counts = [a + b for a, b in zip(mine[0], counts)]
+                    total, count = total + mine[1], count + mine[2]
+                values[key] = (counts, total, count)
+        lines = []
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(float(bound)))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge whose samples are read from a callback at scrape time.
+
+    The callback returns a list of (labels dict, value) pairs.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def collect(self, others=()):
+        try:
+            samples = self.callback()
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {e}")
+            return []
+        return [f"{self.name}{_format_labels(_label_key(labels))} {_format_value(value)}" for labels, value in samples]
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation):
+        return self._register(name, lambda: Counter(name, documentation))
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self._register(name, lambda: Histogram(name, documentation, buckets))
+
+    def gauge_callback(self, name, documentation, callback):
+        # Re-registering replaces the callback (e.g. a rebuilt component)
+        with self._lock:
+            self._metrics[name] = CallbackGauge(name, documentation, callback)
+            return self._metrics[name]
+
+    def render(self, others=()):
+        """Text exposition; others are snapshot() dicts of other processes"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect([other[metric.name] for other in others if metric.name in other]))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Counter and histogram state, JSON-serializable"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.state() for metric in metrics if hasattr(metric, 'state')}
+
+    def _register(self, name, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+class SharedMetrics:
+    """Per-process snapshot files in a directory shared by all workers.
+
+    Each process rewrites its own <pid>.json every `interval` seconds and
+    at scrape time. Files of exited workers are kept, so totals never go
+    backwards when a worker is recycled; the directory is emptied when the
+    server starts (see gunicorn.conf.py).
+    """
+
+    def __init__(self, registry, directory, interval=5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._pid = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        """Start this process's flush thread, once per process (safe after fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+
+    def flush(self):
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def render(self):
+        self.flush()
+        own = f"{os.getpid()}.json"
+        others = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    others.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return self.registry.render(others)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error writing metrics snapshot: {e}")
+
+
+REGISTRY = MetricsRegistry()
+SHARED = None  # SharedMetrics when METRICS_DIR is configured
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by route, method and status')
+STAGE_LATENCY = REGISTRY.histogram(
+    'stage_duration_seconds', 'Latency of hot-path stages by component')
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries', 'SQL statements executed per request', QUERY_COUNT_BUCKETS)
+DB_QUERIES = REGISTRY.counter(
+    'db_queries_total', 'SQL statements executed')
+ERRORS = REGISTRY.counter(
+    'app_errors_total', 'Exceptions handled by route or component')
+LLM_REQUESTS = REGISTRY.counter(
+    'llm_requests_total', 'Gemini generate_content calls by kind and outcome')
+LLM_TOKENS = REGISTRY.counter(
+    'llm_tokens_total', 'Gemini tokens by kind and direction (prompt/output)')
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit/miss)')
+ADVISOR_INTENTS = REGISTRY.counter(
+    'advisor_intents_total', 'Chat questions by how they were answered (local intent, llm or fallback)')
+
+
+def timed(component, stage):
+    """Decorator recording a function's latency as a stage of a component"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_LATENCY.observe(time.perf_counter() - start, component=component, stage=stage)
+        return wrapper
+    return decorator
+
+
+def stage(component, name):
+    """Context manager form of timed() for a block inside a function"""
+    return STAGE_LATENCY.time(component=component, stage=name)
+
+
+def count_error(where, error):
+    ERRORS.inc(where=where, error=type(error).__name__)
+
+
+def count_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+# Seconds each boot phase took in this process: 'app' (create_app) and,
+# under gunicorn, 'worker' (fork until ready to serve; see gunicorn.conf.py)
+BOOT_SECONDS = {}
+
+
+def record_boot(phase, seconds):
+    BOOT_SECONDS[phase] = seconds
+
+
+def process_memory():
+    """This process's memory in bytes: rss, plus pss and shared on Linux.
+
+    shared is the part of rss still shared with other processes, i.e. the
+    copy-on-write pages a preloading master hands to its workers.
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {}
+            for line in f:
+                key, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[key] = int(value.split()[0]) * 1024
+        return {
+            'rss': fields.get('Rss', 0),
+            'pss': fields.get('Pss', 0),
+            'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+        }
+    except OSError:
+        import resource
+        # Peak rather than current, but the best portable figure
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {'rss': peak if os.uname().sysname == 'Darwin' else peak * 1024}
+
+
+def flush():
+    """Write this process's snapshot now, e.g. as a worker exits"""
+    if SHARED is not None:
+        SHARED.flush()
+
+
+def init_app(app, db=None):
+    """Install request hooks, the SQL query counter and the /metrics route"""
+    global SHARED
+    if app.config.get('METRICS_DIR'):
+        SHARED = SharedMetrics(REGISTRY, app.config['METRICS_DIR'], app.config.get('METRICS_FLUSH_INTERVAL', 5.0))
+    token = app.config.get('METRICS_TOKEN') or None
+
+    @app.before_request
+    def _start_request_metrics():
+        if SHARED is not None:
+            # Started from a request so the thread lives in the worker, not a preloading master
+            SHARED.start()
+        g._metrics_start = time.perf_counter()
+        g._metrics_queries = 0
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            # Label by the route pattern, not the raw path, to bound cardinality
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                route=route, method=request.method, status=response.status_code
+            )
+            REQUEST_DB_QUERIES.observe(g.pop('_metrics_queries', 0), route=route)
+        return response
+
+    if db is not None:
+        from sqlalchemy import event
+
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _count_query(conn, cursor, statement, parameters, context, executemany):
+            DB_QUERIES.inc()
+            if has_request_context() and '_metrics_queries' in g:
+                g._metrics_queries += 1
+
+    # Labelled by pid so workers behind one port can be told apart
+    REGISTRY.gauge_callback(
+        'process_memory_bytes', 'Worker memory by kind (rss, pss, shared)',
+        lambda: [({'pid': os.getpid(), 'kind': kind}, value) for kind, value in process_memory().items()]
+    )
+    REGISTRY.gauge_callback(
+        'process_boot_seconds', 'Time each boot phase took in this worker',
+        lambda: [({'pid': os.getpid(), 'phase': phase}, value) for phase, value in BOOT_SECONDS.items()]
+    )
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus scrape endpoint: bearer METRICS_TOKEN, or local requests when unset"""
+        if token:
+            supplied = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+                abort(404)
+        elif request.remote_addr not in ('127.0.0.1', '::1'):
+            abort(404)
+        body = SHARED.render() if SHARED is not None else REGISTRY.render()
+        return Response(body, mimetype='text/plain; version=0.0.4')
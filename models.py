@@ -2,7 +2,13 @@
 Database models for AI Course Advisor
 """
 
+import time
+import hashlib
+
 from extensions import db
+from text_utils import html_to_text, make_snippet, estimate_tokens
+
+DEFAULT_CATALOG = 'txst-cs'
 
 
 class Course(db.Model):
@@ -10,8 +16,12 @@ class Course(db.Model):
     __tablename__ = 'courses'
     
     id = db.Column(db.Integer, primary_key=True)
+    catalog = db.Column(db.String(50), nullable=False, default=DEFAULT_CATALOG, index=True)  # namespace, e.g. 'txst-cs'
     name = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
+    description = db.Column(db.Text)  # raw catalog HTML
+    description_text = db.Column(db.Text)  # plain text, markup stripped
+    snippet = db.Column(db.Text)  # short prompt-ready summary
+    snippet_tokens = db.Column(db.Integer)
     department = db.Column(db.String(50))
     level = db.Column(db.Integer)  # 1=Freshman, 2=Sophomore, 3=Junior, 4=Senior/Grad
     
@@ -26,13 +36,22 @@ class Course(db.Model):
 
     def __repr__(self):
         return f'<Course {self.name}>'
+
+    def set_description(self, html):
+        """Store catalog HTML along with its plain-text and snippet forms"""
+        self.description = html
+        self.description_text = html_to_text(html)
+        self.snippet = make_snippet(self.description_text)
+        self.snippet_tokens = estimate_tokens(self.snippet)
     
     def to_dict(self):
         """Convert course to dictionary for JSON responses"""
         return {
             'id': self.id,
+            'catalog': self.catalog,
             'name': self.name,
             'description': self.description,
+            'snippet': self.snippet,
             'department': self.department,
             'level': self.level
         }
@@ -43,8 +62,8 @@ class CoursePrerequisite(db.Model):
     __tablename__ = 'course_prerequisites'
     
     id = db.Column(db.Integer, primary_key=True)
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
-    prerequisite_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
+    prerequisite_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False, index=True)
     
     # Unique constraint to prevent duplicate prerequisite relationships
     __table_args__ = (
@@ -53,3 +72,104 @@ class CoursePrerequisite(db.Model):
     
     def __repr__(self):
         return f'<CoursePrerequisite course_id={self.course_id} prereq_id={self.prerequisite_id}>'
+
+
+class CatalogRevision(db.Model):
+    """Change counter per catalog, bumped by every write to its courses.
+
+    Lets each process notice an import done elsewhere with one tiny query
+    instead of re-fingerprinting the whole catalog.
+    """
+    __tablename__ = 'catalog_revisions'
+
+    catalog = db.Column(db.String(50), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.Float)
+
+    def __repr__(self):
+        return f'<CatalogRevision {self.catalog} r{self.revision}>'
+
+
+def compute_catalog_version(catalog=None):
+    """Short fingerprint of the course catalog (one namespace, or all of them).
+
+    Changes whenever a course or prerequisite is added, removed or edited,
+    so it can be used to key anything derived from catalog data.
+    """
+    digest = hashlib.sha1()
+    courses = db.session.query(Course.id, Course.name, Course.description).order_by(Course.id)
+    prereqs = db.session.query(CoursePrerequisite.course_id, CoursePrerequisite.prerequisite_id).order_by(
+        CoursePrerequisite.course_id, CoursePrerequisite.prerequisite_id
+    )
+    if catalog is not None:
+        courses = courses.filter(Course.catalog == catalog)
+        prereqs = prereqs.join(Course, Course.id == CoursePrerequisite.course_id).filter(Course.catalog == catalog)
+    for course_id, name, description in courses:
+        digest.update(f"{course_id}\x1f{name}\x1f{description or ''}\x1e".encode('utf-8'))
+    for course_id, prereq_id in prereqs:
+        digest.update(f"{course_id}>{prereq_id};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def bump_catalog_revision(catalog):
+    """Mark a catalog as changed; call inside the transaction that writes its courses"""
+    bumped = db.session.query(CatalogRevision).filter(CatalogRevision.catalog == catalog).update(
+        {CatalogRevision.revision: CatalogRevision.revision + 1, CatalogRevision.updated_at: time.time()},
+        synchronize_session=False
+    )
+    if not bumped:
+        db.session.add(CatalogRevision(catalog=catalog, revision=1, updated_at=time.time()))
+
+
+def catalog_revisions():
+    """{catalog: revision} for every catalog that has been written to"""
+    return dict(db.session.query(CatalogRevision.catalog, CatalogRevision.revision).all())
+
+
+def list_catalogs():
+    """(catalog, course count) for every namespace with courses"""
+    return db.session.query(Course.catalog, db.func.count(Course.id)).group_by(Course.catalog).order_by(Course.catalog).all()
+
+
+def upgrade_catalog_column():
+    """Add the catalog namespace column to databases created before it
+    existed; their courses all belong to the default catalog."""
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns('courses')}
+    if 'catalog' in existing:
+        return False
+    db.session.execute(db.text(
+        f"ALTER TABLE courses ADD COLUMN catalog VARCHAR(50) NOT NULL DEFAULT '{DEFAULT_CATALOG}'"
+    ))
+    db.session.execute(db.text('CREATE INDEX IF NOT EXISTS ix_courses_catalog ON courses (catalog)'))
+    db.session.commit()
+    return True
+
+
+def upgrade_prerequisite_indexes():
+    """Index both sides of the prerequisite table on databases created
+    before the columns were indexed. Safe to run on every startup."""
+    for column in ('course_id', 'prerequisite_id'):
+        db.session.execute(db.text(
+            f'CREATE INDEX IF NOT EXISTS ix_course_prerequisites_{column} ON course_prerequisites ({column})'
+        ))
+    db.session.commit()
+
+
+def upgrade_course_text_columns():
+    """Add and backfill the plain-text description columns on databases
+    created before they existed. Safe to run on every startup."""
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns('courses')}
+    added = False
+    for name, ddl in (('description_text', 'TEXT'), ('snippet', 'TEXT'), ('snippet_tokens', 'INTEGER')):
+        if name not in existing:
+            db.session.execute(db.text(f'ALTER TABLE courses ADD COLUMN {name} {ddl}'))
+            added = True
+    if added:
+        db.session.commit()
+
+    stale = Course.query.filter(Course.description_text.is_(None)).all()
+    for course in stale:
+        course.set_description(course.description)
+    if stale:
+        db.session.commit()
+    return len(stale)
@@ -0,0 +1,252 @@
+"""
+Request Profiler - Opt-in, sampled profiling of production requests
+A configurable fraction of requests (or any request carrying the trusted
+profile header) is profiled along with its SQL statements. Profiles are
+written to a local directory as folded stacks (flamegraph/speedscope) or
+cProfile .prof files, and the slowest ones are listed at /debug/profiles.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import cProfile
+import logging
+import threading
+from collections import Counter
+
+from flask import g, has_request_context, request, jsonify, abort, send_from_directory
+
+logger = logging.getLogger('profiling')
+
+LOCAL_ADDRS = {'127.0.0.1', '::1'}
+
+
+class StackSampler:
+    """Samples one thread's call stack on a timer from a helper thread.
+
+    Overhead on the profiled thread is limited to GIL hand-offs, which keeps
+    it usable in production where a tracing profiler would not be.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        """Samples in collapsed-stack format, one 'frame;frame;frame count' per line"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class RequestProfiler:
+    """Flask hooks that profile sampled requests and log their SQL"""
+
+    def __init__(self, app=None, db=None):
+        self.app = app
+        self.sample_rate = 0.0
+        self.mode = 'sample'
+        self.interval = 0.005
+        self.directory = None
+        self.token = None
+        self.header = 'X-Profile'
+        self.max_profiles = 200
+
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.app = app
+        config = app.config
+        self.sample_rate = config.get('PROFILE_SAMPLE_RATE', self.sample_rate)
+        self.mode = config.get('PROFILE_MODE', self.mode)
+        self.interval = config.get('PROFILE_INTERVAL_MS', self.interval * 1000) / 1000
+        self.directory = config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.token = config.get('PROFILE_TOKEN') or None
+        self.header = config.get('PROFILE_HEADER', self.header)
+        self.max_profiles = config.get('PROFILE_MAX_FILES', self.max_profiles)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+        if db is not None:
+            self._install_sql_log(app, db)
+
+        app.add_url_rule('/debug/profiles', 'list_profiles', self.list_profiles)
+        app.add_url_rule('/debug/profiles/<filename>', 'get_profile', self.get_profile)
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or self.token is not None
+
+    def _requested(self):
+        """Profile this request? Sampled by rate, or forced by a trusted header"""
+        if self.token and self._token_supplied():
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if not self.enabled or request.endpoint in ('list_profiles', 'get_profile', 'metrics'):
+            return
+        if not self._requested():
+            return
+
+        state = {'start': time.perf_counter(), 'sql': []}
+        if self.mode == 'cprofile':
+            state['profiler'] = cProfile.Profile()
+            state['profiler'].enable()
+        else:
+            state['sampler'] = StackSampler(threading.get_ident(), self.interval).start()
+        g._profile = state
+
+    def _finish(self, response):
+        state = g.pop('_profile', None)
+        if state is not None:
+            self._complete(state, response.status_code)
+        return response
+
+    def _teardown(self, exc):
+        # after_request is skipped when a view raises; the profiler must still stop
+        state = g.pop('_profile', None)
+        if state is not None:
+            self._complete(state, 500)
+
+    def _complete(self, state, status):
+        duration = time.perf_counter() - state['start']
+        if 'profiler' in state:
+            state['profiler'].disable()
+        else:
+            state['sampler'].stop()
+        try:
+            self._write(state, duration, status)
+        except Exception as e:
+            logger.error(f"Error writing profile: {e}")
+
+    def _write(self, state, duration, status):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        if 'profiler' in state:
+            profile_file = f"{profile_id}.prof"
+            state['profiler'].dump_stats(os.path.join(self.directory, profile_file))
+        else:
+            profile_file = f"{profile_id}.folded"
+            with open(os.path.join(self.directory, profile_file), 'w') as f:
+                f.write(state['sampler'].folded())
+
+        meta = {
+            'id': profile_id,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': status,
+            'duration_ms': round(duration * 1000, 3),
+            'mode': self.mode,
+            'profile_file': profile_file,
+            'sql_count': len(state['sql']),
+            'sql_ms': round(sum(q['ms'] for q in state['sql']), 3),
+            'sql': state['sql'],
+            'created_at': time.time()
+        }
+        with open(os.path.join(self.directory, f"{profile_id}.json"), 'w') as f:
+            json.dump(meta, f)
+
+        self._prune()
+        logger.info(f"Profiled {request.method} {request.path} in {meta['duration_ms']}ms -> {profile_file}")
+
+    def _prune(self):
+        metas = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        for name in metas[:max(0, len(metas) - self.max_profiles)]:
+            stem = name[:-len('.json')]
+            for suffix in ('.json', '.folded', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, stem + suffix))
+                except OSError:
+                    pass
+
+    def _install_sql_log(self, app, db):
+        from sqlalchemy import event
+
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context() and '_profile' in g:
+                conn.info.setdefault('_profile_query_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('_profile_query_start')
+            if not starts:
+                return
+            elapsed = time.perf_counter() - starts.pop()
+            if has_request_context() and '_profile' in g:
+                g._profile['sql'].append({
+                    'statement': ' '.join(statement.split())[:500],
+                    'ms': round(elapsed * 1000, 3)
+                })
+
+    def _token_supplied(self):
+        # Header only: a query-string token would end up in access logs. Bytes,
+        # because compare_digest rejects non-ASCII str with a TypeError.
+        supplied = request.headers.get(self.header, '')
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def _authorized(self):
+        if self.token:
+            return self._token_supplied()
+        return request.remote_addr in LOCAL_ADDRS
+
+    def list_profiles(self):
+        """Slowest captured requests, newest profiles first on ties"""
+        if not self._authorized():
+            abort(404)
+        limit = request.args.get('limit', 20, type=int)
+        profiles = []
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                meta.pop('sql', None)
+                profiles.append(meta)
+        profiles.sort(key=lambda m: (m['duration_ms'], m['created_at']), reverse=True)
+        return jsonify({"count": len(profiles), "profiles": profiles[:limit]})
+
+    def get_profile(self, filename):
+        """Download a profile file, or its .json metadata with the SQL log"""
+        if not self._authorized():
+            abort(404)
+        return send_from_directory(self.directory, filename)
@@ -4,6 +4,8 @@ from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 import os
 import logging
+from text_utils import html_to_text, make_snippet
+from metrics import timed
 
 logger = logging.getLogger('recommender')
 
@@ -15,6 +17,7 @@ class CourseRecommender:
         self.similarity_matrix = None
         self.vectorizer = None
         self.courses_df = None
+        self.model_path = os.path.join(os.path.dirname(__file__), 'model', 'recommender_model.pkl')
         
         if app is not None:
             self.init_app(app)
@@ -23,15 +26,19 @@ class CourseRecommender:
         """Initialize with Flask app context"""
         self.app = app
 
+    @timed('recommender', 'train')
     def train(self, courses):
         """Train the recommender model on course data"""
         try:
             data = []
             for course in courses:
+                # Plain text keeps markup tokens (href, class names) out of the vocabulary
+                description = getattr(course, 'description_text', None) or html_to_text(course.description)
                 data.append({
                     'id': course.id,
                     'name': course.name,
-                    'description': course.description or '',
+                    'description': description,
+                    'snippet': getattr(course, 'snippet', None) or make_snippet(description),
                     'department': course.department or '',
                     'level': str(course.level or '')
                 })
@@ -47,16 +54,17 @@ class CourseRecommender:
             tfidf_matrix = self.vectorizer.fit_transform(self.courses_df['content'])
             self.similarity_matrix = cosine_similarity(tfidf_matrix)
             
-            model_dir = os.path.join(os.path.dirname(__file__), 'model')
-            os.makedirs(model_dir, exist_ok=True)
-            model_path = os.path.join(model_dir, 'recommender_model.pkl')
+            os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
             
-            with open(model_path, 'wb') as f:
+            # Other workers may be loading or retraining the same file: swap it in whole
+            tmp_path = f"{self.model_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
                 pickle.dump({
                     'vectorizer': self.vectorizer,
                     'similarity_matrix': self.similarity_matrix,
                     'courses_df': self.courses_df
                 }, f)
+            os.replace(tmp_path, self.model_path)
             
             logger.info("Recommender model trained successfully")
             return True
@@ -68,8 +76,7 @@ class CourseRecommender:
     def load_model(self):
         """Load trained model from file"""
         try:
-            model_path = os.path.join(os.path.dirname(__file__), 'model', 'recommender_model.pkl')
-            with open(model_path, 'rb') as f:
+            with open(self.model_path, 'rb') as f:
                 model_data = pickle.load(f)
                 self.vectorizer = model_data['vectorizer']
                 self.similarity_matrix = model_data['similarity_matrix']
@@ -80,6 +87,7 @@ class CourseRecommender:
             logger.error(f"Error loading model: {e}")
             return False
     
+    @timed('recommender', 'recommend_courses')
     def recommend_courses(self, interests, num_recommendations=5):
         """Recommend courses based on user interests"""
         try:
@@ -108,6 +116,7 @@ class CourseRecommender:
             logger.error(f"Error recommending courses: {e}")
             return []
     
+    @timed('recommender', 'recommend_based_on_course')
     def recommend_based_on_course(self, course_id, num_recommendations=5):
         """Recommend similar courses"""
         try:
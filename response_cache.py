@@ -0,0 +1,141 @@
+"""
+Response Cache - Pre-rendered, pre-compressed responses for catalog-derived routes
+Bodies are rendered once per catalog version, compressed lazily per encoding
+(brotli when installed, gzip otherwise) and served with ETag/Cache-Control so
+browsers can revalidate with a 304 instead of downloading again.
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, current_app, Response
+
+from metrics import count_cache
+
+logger = logging.getLogger('response_cache')
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+class CachedBody:
+    """A rendered response body plus its compressed variants"""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'variants')
+
+    def __init__(self, body, mimetype, version):
+        self.body = body
+        self.mimetype = mimetype
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        self.etag = f"{version or 'none'}-{digest}"
+        self.variants = {}
+
+
+class ResponseCache:
+    """Decorator-driven cache for GET routes whose output depends only on the
+    request path/query and the catalog version"""
+
+    def __init__(self, app=None, version_fn=None):
+        self.app = app
+        self.version_fn = version_fn or (lambda: None)
+        self.max_entries = 512
+        self.max_age = 300
+        self.min_compress_bytes = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app, version_fn)
+
+    def init_app(self, app, version_fn=None):
+        self.app = app
+        if version_fn is not None:
+            self.version_fn = version_fn
+        self.max_entries = app.config.get('RESPONSE_CACHE_SIZE', self.max_entries)
+        self.max_age = app.config.get('RESPONSE_CACHE_MAX_AGE', self.max_age)
+        self.min_compress_bytes = app.config.get('RESPONSE_MIN_COMPRESS_BYTES', self.min_compress_bytes)
+
+    def cached(self, cache_control=None, version_fn=None):
+        """Cache a view's successful output per (path, query, catalog version).
+
+        cache_control defaults to a public max-age; pass 'no-cache' for pages
+        that should always be revalidated (still cheap thanks to the ETag).
+        version_fn overrides the cache-wide version, e.g. for catalog-scoped
+        routes; it receives the view's keyword arguments.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                version = version_fn(**kwargs) if version_fn else self.version_fn()
+                key = (request.path, tuple(sorted(request.args.items(multi=True))), version)
+
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        self._entries.move_to_end(key)
+                count_cache('response', entry is not None)
+
+                if entry is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response  # never cache errors
+                    entry = CachedBody(response.get_data(), response.mimetype, version)
+                    with self._lock:
+                        self._entries[key] = entry
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+
+                return self._serve(entry, cache_control or f"public, max-age={self.max_age}")
+            return wrapper
+        return decorator
+
+    def clear(self):
+        """Drop every cached body, e.g. after the catalog is re-imported"""
+        with self._lock:
+            self._entries.clear()
+
+    def _serve(self, entry, cache_control):
+        if request.if_none_match.contains_weak(entry.etag):
+            response = Response(status=304)
+        else:
+            encoding = self._choose_encoding(entry)
+            body = self._variant(entry, encoding) if encoding else entry.body
+            response = Response(body, mimetype=entry.mimetype)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        # Weak: the same representation is served under several encodings
+        response.set_etag(entry.etag, weak=True)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _choose_encoding(self, entry):
+        if len(entry.body) < self.min_compress_bytes:
+            return None
+        accepted = request.accept_encodings
+        if BROTLI_AVAILABLE and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _variant(self, entry, encoding):
+        body = entry.variants.get(encoding)
+        if body is None:
+            # Compressed once per entry; concurrent first hits may both compress
+            if encoding == 'br':
+                body = brotli.compress(entry.body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(entry.body, compresslevel=self.gzip_level, mtime=0)
+            entry.variants[encoding] = body
+        return body
@@ -0,0 +1,166 @@
+"""
+Result Cache - Bounded LRU cache with optional on-disk store and expiry
+Used to avoid re-parsing and re-analyzing resumes students upload again.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('result_cache')
+
+
+class ResultCache:
+    """In-memory LRU cache with TTL, optionally backed by a directory of JSON files.
+
+    Entries expire after `ttl` seconds in both tiers, so cached personal data
+    (resume text, analyses) is never retained longer than configured.
+    """
+
+    PURGE_EVERY = 100
+
+    def __init__(self, max_entries=256, ttl=86400, directory=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if self.directory:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            self.purge_expired()
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            # Keep the stored expiry: a disk hit must not extend retention
+            expires_at, value = entry
+            self.hits += 1
+            self._remember(key, value, expires_at)
+        return value
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under key"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._writes += 1
+            purge = self.directory and self._writes % self.PURGE_EVERY == 0
+
+        self._write_disk(key, value, expires_at)
+        if purge:
+            self.purge_expired()
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    self._remove(os.path.join(self.directory, name))
+
+    def purge_expired(self):
+        """Delete expired entries; returns how many were removed"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                del self._entries[key]
+                removed += 1
+
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    with open(path) as f:
+                        expires_at = json.load(f).get('expires_at', 0)
+                except (OSError, ValueError):
+                    expires_at = 0
+                if expires_at <= now:
+                    self._remove(path)
+                    removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        # Keys may contain content hashes and versions; file names stay opaque.
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _read_disk(self, key, now):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry: {e}")
+            self._remove(path)
+            return None
+
+        if entry.get('key') != key or entry.get('expires_at', 0) <= now:
+            self._remove(path)
+            return None
+        return entry['expires_at'], entry.get('value')
+
+    def _write_disk(self, key, value, expires_at):
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"key": key, "expires_at": expires_at, "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not write cache entry: {e}")
+            self._remove(tmp_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,309 @@
+"""
+Resume Extractor - Bounded PDF text extraction for resume analysis
+Uploads are size-checked and spooled off the request stream, then parsed
+in a process of their own with page, time and memory limits. A document
+that hangs or blows a limit takes down only its own process, never another
+student's extraction.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+
+from text_utils import normalize_whitespace, truncate_to_tokens, CHARS_PER_TOKEN
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits; extraction still runs, unbounded
+    resource = None
+
+logger = logging.getLogger('resume_extractor')
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ResumeExtractionError(Exception):
+    """Raised when an upload can't be turned into resume text.
+
+    The message is safe to show to the student.
+    """
+
+
+class SpooledUpload:
+    """An upload copied off the request stream, held in memory or on disk"""
+
+    def __init__(self, data=None, path=None, size=0, sha256=None):
+        self.data = data
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def source(self):
+        """What the worker reads: raw bytes for small files, a path otherwise"""
+        return self.path if self.path else self.data
+
+    def close(self):
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _limit_worker_memory(memory_limit):
+    """Cap address space growth of the extraction process"""
+    if resource is None or not memory_limit:
+        return
+    try:
+        # The process already maps the interpreter and its imports, so the
+        # cap is headroom on top of the current size, not an absolute value.
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        current = 0
+    limit = current + memory_limit
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _extract_pdf_text(source, max_pages, max_chars, cpu_seconds=None):
+    """Pull text out of a PDF. Runs inside an extraction process.
+
+    Returns (text, total_pages, pages_read). Stops early once max_chars
+    is reached so oversized documents never cross the process boundary.
+    """
+    if resource is not None and cpu_seconds:
+        # RLIMIT_CPU is cumulative, so grant this document its own slice.
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + int(cpu_seconds) + 1
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+    import pypdf
+
+    stream = source if isinstance(source, str) else io.BytesIO(source)
+    reader = pypdf.PdfReader(stream)
+    total_pages = len(reader.pages)
+
+    parts = []
+    chars = 0
+    pages_read = 0
+    for page in reader.pages[:max_pages]:
+        text = page.extract_text() or ""
+        parts.append(text)
+        chars += len(text)
+        pages_read += 1
+        if chars >= max_chars:
+            break
+
+    return "\n".join(parts), total_pages, pages_read
+
+
+class ResumeExtractor:
+    """Turns uploaded resume PDFs into prompt-sized text"""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.max_bytes = 5 * 1024 * 1024
+        self.spool_threshold = 512 * 1024
+        self.spool_dir = None
+        self.max_pages = 10
+        self.max_tokens = 3000
+        self.timeout = 10
+        self.memory_limit = 256 * 1024 * 1024
+        self.workers = 2
+        self._slots = None
+        self._slots_pid = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Read limits from the Flask config"""
+        self.app = app
+        config = app.config
+        self.max_bytes = config.get('RESUME_MAX_BYTES', self.max_bytes)
+        self.spool_threshold = config.get('RESUME_SPOOL_THRESHOLD', self.spool_threshold)
+        self.spool_dir = config.get('RESUME_SPOOL_DIR', self.spool_dir)
+        self.max_pages = config.get('RESUME_MAX_PAGES', self.max_pages)
+        self.max_tokens = config.get('RESUME_MAX_TOKENS', self.max_tokens)
+        self.timeout = config.get('RESUME_EXTRACT_TIMEOUT', self.timeout)
+        self.memory_limit = config.get('RESUME_WORKER_MEMORY_MB', self.memory_limit // (1024 * 1024)) * 1024 * 1024
+        self.workers = config.get('RESUME_EXTRACT_WORKERS', self.workers)
+
+    def extract(self, file_storage):
+        """Spool and extract an upload in one step"""
+        with self.spool(file_storage) as upload:
+            return self.extract_text(upload)
+
+    def spool(self, file_storage):
+        """Copy an upload off the request stream, enforcing the size cap.
+
+        Small uploads stay in memory; anything past the spool threshold
+        is written to a temporary file so the worker never holds it twice.
+        """
+        stream = getattr(file_storage, 'stream', file_storage)
+        buffer = io.BytesIO()
+        digest = hashlib.sha256()
+        spill = None
+        size = 0
+
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                digest.update(chunk)
+                if size > self.max_bytes:
+                    raise ResumeExtractionError(
+                        f"That file is too large. Please upload a PDF under {max(1, self.max_bytes // (1024 * 1024))} MB."
+                    )
+                if spill is None and size > self.spool_threshold:
+                    spill = tempfile.NamedTemporaryFile(
+                        prefix='resume-', suffix='.pdf', dir=self.spool_dir, delete=False
+                    )
+                    spill.write(buffer.getvalue())
+                    buffer = None
+                if spill is not None:
+                    spill.write(chunk)
+                else:
+                    buffer.write(chunk)
+        except BaseException:
+            if spill is not None:
+                spill.close()
+                os.remove(spill.name)
+            raise
+
+        if spill is not None:
+            spill.close()
+            upload = SpooledUpload(path=spill.name, size=size, sha256=digest.hexdigest())
+        else:
+            upload = SpooledUpload(data=buffer.getvalue(), size=size, sha256=digest.hexdigest())
+
+        if not self._looks_like_pdf(upload):
+            upload.close()
+            raise ResumeExtractionError("That doesn't look like a PDF. Please upload a digital PDF resume.")
+        return upload
+
+    def extract_text(self, upload):
+        """Extract, clean and budget the text of a spooled upload"""
+        max_chars = self.max_tokens * CHARS_PER_TOKEN
+        args = (upload.source, self.max_pages, max_chars, self.timeout)
+
+        try:
+            if not self.workers:
+                raw_text, total_pages, pages_read = _extract_pdf_text(*args[:3])
+            else:
+                raw_text, total_pages, pages_read = self._extract_in_process(args, upload.size)
+        except ResumeExtractionError:
+            raise
+        except Exception as e:
+            logger.error(f"PDF extraction error: {e}")
+            raise ResumeExtractionError("I encountered an error reading your PDF. Please ensure it's a standard digital file.")
+
+        text = normalize_whitespace(raw_text)
+        truncated = pages_read < total_pages or len(text) > max_chars
+        text = truncate_to_tokens(text, self.max_tokens)
+
+        return {
+            "text": text,
+            "pages": total_pages,
+            "pages_read": pages_read,
+            "truncated": truncated
+        }
+
+    def _extract_in_process(self, args, size):
+        """Run one extraction in a fresh interpreter, killed on timeout.
+
+        A subprocess rather than multiprocessing: nothing is forked from
+        the threaded web process, and the child does not re-import the
+        parent's main module (app.py would rebuild the whole app). At most
+        `workers` documents are parsed at once; waiting for a slot counts
+        against the same timeout.
+        """
+        source, max_pages, max_chars, cpu_seconds = args
+        deadline = time.monotonic() + self.timeout
+        slots = self._get_slots()
+        if not slots.acquire(timeout=self.timeout):
+            raise ResumeExtractionError("Resume analysis is busy right now. Please try again in a minute.")
+        try:
+            command = [sys.executable, '-m', 'resume_extractor',
+                       str(max_pages), str(max_chars), str(cpu_seconds), str(self.memory_limit)]
+            if isinstance(source, str):
+                command.append(source)
+            process = subprocess.Popen(
+                command, cwd=os.path.dirname(os.path.abspath(__file__)),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+            )
+            try:
+                output, _ = process.communicate(
+                    None if isinstance(source, str) else source,
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                logger.warning(f"PDF extraction timed out after {self.timeout}s ({size} bytes)")
+                raise ResumeExtractionError("That PDF took too long to read. Please upload a simpler file.")
+        finally:
+            slots.release()
+
+        if not output:
+            # Died without answering: CPU or memory limit
+            logger.warning(f"PDF extraction process died while reading {size} bytes (exit {process.returncode})")
+            raise ResumeExtractionError("That PDF was too complex to read. Please upload a simpler file.")
+        result = json.loads(output)
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return result['text'], result['pages'], result['pages_read']
+
+    def _get_slots(self):
+        # A semaphore held by another thread at fork time would stay held in the child
+        if self._slots is None or self._slots_pid != os.getpid():
+            self._slots = threading.BoundedSemaphore(max(1, self.workers))
+            self._slots_pid = os.getpid()
+        return self._slots
+
+    @staticmethod
+    def _looks_like_pdf(upload):
+        if upload.path:
+            with open(upload.path, 'rb') as f:
+                head = f.read(1024)
+        else:
+            head = upload.data[:1024]
+        return b'%PDF-' in head
+
+
+def _extraction_main(argv):
+    """Child side of _extract_in_process: PDF from a path or stdin, JSON to stdout"""
+    max_pages, max_chars, cpu_seconds, memory_limit = (int(float(value)) for value in argv[:4])
+    source = argv[4] if len(argv) > 4 else sys.stdin.buffer.read()
+    try:
+        _limit_worker_memory(memory_limit)
+        text, pages, pages_read = _extract_pdf_text(source, max_pages, max_chars, cpu_seconds)
+        result = {"text": text, "pages": pages, "pages_read": pages_read}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    sys.stdout.write(json.dumps(result))
+
+
+if __name__ == '__main__':
+    _extraction_main(sys.argv[1:])
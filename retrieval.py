@@ -0,0 +1,109 @@
+"""
+Retrieval Engine - Dense course retrieval for the RAG advisor
+Projects the recommender's TF-IDF space onto a truncated SVD basis and ranks
+courses by cosine similarity against a precomputed, normalized matrix.
+"""
+
+import logging
+from collections import namedtuple
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+
+from text_utils import html_to_text, make_snippet, estimate_tokens
+
+logger = logging.getLogger('retrieval')
+
+# Quacks like a Course row for everything the advisor reads, plus a score
+RetrievedCourse = namedtuple('RetrievedCourse', ['id', 'name', 'description', 'snippet', 'snippet_tokens', 'department', 'score'])
+
+CODE_BOOST = 1.0     # an explicitly named course always ranks first
+LEXICAL_BOOST = 0.15  # per matched topic phrase in the course name
+MIN_SCORE = 0.01      # below this a match is SVD noise, not relevance
+
+
+class RetrievalEngine:
+    """Top-k course search in a reduced TF-IDF space"""
+
+    def __init__(self, n_components=128):
+        self.n_components = n_components
+        self.vectorizer = None
+        self.svd = None
+        self.matrix = None
+        self.courses = []
+        self._names = None
+
+    @property
+    def ready(self):
+        return self.matrix is not None and len(self.courses) > 0
+
+    def build(self, recommender):
+        """Index the catalog using a trained CourseRecommender's vectorizer"""
+        if recommender.vectorizer is None or recommender.courses_df is None or recommender.courses_df.empty:
+            logger.warning("Recommender not trained - retrieval index not built")
+            return False
+
+        try:
+            df = recommender.courses_df
+            tfidf = recommender.vectorizer.transform(df['content'])
+
+            n_components = min(self.n_components, tfidf.shape[0] - 1, tfidf.shape[1] - 1)
+            if n_components >= 2:
+                svd = TruncatedSVD(n_components=n_components, random_state=42)
+                matrix = svd.fit_transform(tfidf)
+            else:
+                svd = None
+                matrix = tfidf.toarray()
+
+            self.matrix = self._normalize(matrix.astype(np.float32))
+            self.svd = svd
+            self.vectorizer = recommender.vectorizer
+            self.courses = []
+            for row in df.itertuples(index=False):
+                # Models pickled before snippets existed carry raw HTML only
+                description = html_to_text(row.description)
+                snippet = getattr(row, 'snippet', None) or make_snippet(description)
+                self.courses.append(RetrievedCourse(
+                    int(row.id), row.name, description, snippet, estimate_tokens(snippet), row.department, 0.0
+                ))
+            self._names = np.array([c.name.lower() for c in self.courses])
+            logger.info(f"Retrieval index built: {len(self.courses)} courses, {self.matrix.shape[1]} dims")
+            return True
+        except Exception as e:
+            logger.error(f"Error building retrieval index: {e}")
+            self.matrix = None
+            return False
+
+    def embed(self, text):
+        """Project text into the reduced, normalized space"""
+        vector = self.vectorizer.transform([text])
+        vector = self.svd.transform(vector) if self.svd is not None else vector.toarray()
+        return self._normalize(vector.astype(np.float32))[0]
+
+    def search(self, text, k=5, boost_terms=None):
+        """Return up to k courses ranked by relevance to text.
+
+        boost_terms (course codes or topic phrases from the TopicMatcher)
+        re-rank courses whose names contain them.
+        """
+        if not self.ready or not text:
+            return []
+
+        scores = self.matrix @ self.embed(text)
+        for term in boost_terms or []:
+            term = term.lower()
+            hits = np.char.find(self._names, term) >= 0
+            if hits.any():
+                boost = CODE_BOOST if any(ch.isdigit() for ch in term) else LEXICAL_BOOST
+                scores = scores + hits * boost
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.courses[i]._replace(score=float(scores[i])) for i in top if scores[i] >= MIN_SCORE]
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
@@ -5,14 +5,37 @@ Grounded in Texas State University CS Data
 
 from flask import render_template, request, jsonify, current_app
 from models import Course
+from catalogs import UnknownCatalogError
+from resume_extractor import ResumeExtractionError
+from metrics import count_error
 import logging
 
 logger = logging.getLogger('routes')
 
+MAX_SUBGRAPH_IDS = 200
+
+
+def parse_subgraph_args():
+    """Course ids, direction and depth limit of a subgraph query; ValueError if malformed"""
+    raw_ids = [part for part in request.args.get('ids', '').split(',') if part.strip()]
+    if not raw_ids:
+        raise ValueError("ids is required, e.g. ?ids=1,2,3")
+    if len(raw_ids) > MAX_SUBGRAPH_IDS:
+        raise ValueError(f"At most {MAX_SUBGRAPH_IDS} course ids per query")
+    try:
+        course_ids = [int(part) for part in raw_ids]
+    except ValueError:
+        raise ValueError("ids must be comma-separated integers")
+    direction = request.args.get('direction', 'both')
+    max_depth = request.args.get('max_depth', type=int)
+    return course_ids, direction, max_depth
+
 def register_routes(app):
     """Register all application routes"""
+    cached = app.response_cache.cached
     
     @app.route('/')
+    @cached(cache_control='no-cache')
     def home():
         """Render the main dashboard"""
         return render_template('index.html')
@@ -33,6 +56,7 @@ def register_routes(app):
             return jsonify(response)
         except Exception as e:
             logger.error(f"Error in chat: {e}")
+            count_error('route.chat', e)
             return jsonify({"error": "I'm having trouble connecting to the advisor."}), 500
 
     @app.route('/api/analyze_resume', methods=['POST'])
@@ -52,22 +76,78 @@ def register_routes(app):
             
         except Exception as e:
             logger.error(f"Resume analysis error: {e}")
+            count_error('route.analyze_resume', e)
             return jsonify({"error": "Failed to analyze document"}), 500
 
+    @app.route('/api/jobs/resume_analysis', methods=['POST'])
+    def submit_resume_analysis():
+        """Queue a resume analysis; poll /api/jobs/<job_id> for the result"""
+        try:
+            if 'file' not in request.files:
+                return jsonify({"error": "No file uploaded"}), 400
+
+            file = request.files['file']
+            if file.filename == '':
+                return jsonify({"error": "No selected file"}), 400
+
+            if not app.advisor.client:
+                return jsonify({"message": "Resume analysis is currently offline."})
+
+            # Validate and spool now so bad uploads fail fast, before queueing
+            try:
+                upload = app.advisor.extractor.spool(file)
+            except ResumeExtractionError as e:
+                return jsonify({"error": str(e)}), 400
+
+            with upload:
+                job_id = app.jobs.enqueue(
+                    'resume_analysis',
+                    {"size": upload.size, "sha256": upload.sha256},
+                    attachment=upload.path or upload.data
+                )
+            return jsonify({
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/jobs/{job_id}"
+            }), 202
+
+        except Exception as e:
+            logger.error(f"Error queueing resume analysis: {e}")
+            count_error('route.submit_resume_analysis', e)
+            return jsonify({"error": "Failed to queue document"}), 500
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        """Status of a background job, with its result once finished"""
+        try:
+            job = app.jobs.get(job_id)
+            if job is None:
+                return jsonify({"error": "Job not found"}), 404
+            response = jsonify(job)
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        except Exception as e:
+            logger.error(f"Error reading job {job_id}: {e}")
+            count_error('route.get_job', e)
+            return jsonify({"error": "Failed to read job"}), 500
+
     @app.route('/api/courses', methods=['GET'])
+    @cached()
     def list_courses():
         """Fetch all indexed Texas State CS courses"""
         try:
-            courses = Course.query.all()
+            courses = Course.query.filter_by(catalog=app.advisor.catalog).all()
             return jsonify({
                 "count": len(courses),
                 "courses": [course.to_dict() for course in courses]
             })
         except Exception as e:
             logger.error(f"Error listing courses: {e}")
+            count_error('route.list_courses', e)
             return jsonify({"error": "Database error"}), 500
 
     @app.route('/api/journey/graph', methods=['GET'])
+    @cached()
     def get_journey_graph():
         """Data for D3.js prerequisite visualization"""
         try:
@@ -75,9 +155,11 @@ def register_routes(app):
             return jsonify(graph_data)
         except Exception as e:
             logger.error(f"Error getting graph: {e}")
+            count_error('route.get_journey_graph', e)
             return jsonify({"error": "Failed to load map"}), 500
 
     @app.route('/api/journey/prerequisites/<int:course_id>', methods=['GET'])
+    @cached()
     def get_prerequisites(course_id):
         """Fetch specific prerequisite chains"""
         try:
@@ -85,8 +167,41 @@ def register_routes(app):
             return jsonify(chain_data)
         except Exception as e:
             logger.error(f"Error getting prerequisites: {e}")
+            count_error('route.get_prerequisites', e)
             return jsonify({"error": "Failed to load prerequisites"}), 500
 
+    @app.route('/api/journey/subgraph', methods=['GET'])
+    @cached()
+    def get_journey_subgraph():
+        """Merged chains of several courses in one response.
+
+        ?ids=1,5,9&direction=prerequisites|unlocks|both&max_depth=2
+        """
+        try:
+            course_ids, direction, max_depth = parse_subgraph_args()
+            return jsonify(app.journey_map.get_subgraph(course_ids, direction, max_depth))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error getting subgraph: {e}")
+            count_error('route.get_journey_subgraph', e)
+            return jsonify({"error": "Failed to load subgraph"}), 500
+
+    @app.route('/api/journey/bottlenecks', methods=['GET'])
+    @cached()
+    def get_bottlenecks():
+        """Courses ranked by a precomputed curriculum metric (default: bottleneck score)"""
+        try:
+            metric = request.args.get('metric', 'bottleneck')
+            limit = min(request.args.get('limit', 10, type=int), 100)
+            return jsonify(app.journey_map.get_bottlenecks(metric, limit))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error ranking bottlenecks: {e}")
+            count_error('route.get_bottlenecks', e)
+            return jsonify({"error": "Failed to load analytics"}), 500
+
     @app.route('/api/recommendations/courses', methods=['GET'])
     def recommend_courses():
         """TF-IDF interest matching"""
@@ -99,8 +214,145 @@ def register_routes(app):
             return jsonify(recommendations)
         except Exception as e:
             logger.error(f"Error recommending: {e}")
+            count_error('route.recommend_courses', e)
+            return jsonify({"error": "Recommender error"}), 500
+
+    # Catalog-scoped routes: each catalog's graph and indexes load on first use
+    def catalog_version(catalog, **kwargs):
+        try:
+            return app.catalogs.version(catalog)
+        except UnknownCatalogError:
+            return None
+
+    def unknown_catalog(catalog):
+        return jsonify({"error": f"Unknown catalog: {catalog}"}), 404
+
+    @app.route('/api/catalogs', methods=['GET'])
+    def list_catalogs():
+        """Catalog namespaces with course counts and load state"""
+        try:
+            return jsonify({"catalogs": app.catalogs.catalogs(), **app.catalogs.stats()})
+        except Exception as e:
+            logger.error(f"Error listing catalogs: {e}")
+            count_error('route.list_catalogs', e)
+            return jsonify({"error": "Database error"}), 500
+
+    @app.route('/api/catalogs/<catalog>/courses', methods=['GET'])
+    @cached(version_fn=catalog_version)
+    def list_catalog_courses(catalog):
+        """Fetch all courses in one catalog"""
+        try:
+            app.catalogs.get(catalog)
+            courses = Course.query.filter_by(catalog=catalog).all()
+            return jsonify({
+                "catalog": catalog,
+                "count": len(courses),
+                "courses": [course.to_dict() for course in courses]
+            })
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except Exception as e:
+            logger.error(f"Error listing courses for {catalog}: {e}")
+            count_error('route.list_catalog_courses', e)
+            return jsonify({"error": "Database error"}), 500
+
+    @app.route('/api/catalogs/<catalog>/journey/graph', methods=['GET'])
+    @cached(version_fn=catalog_version)
+    def get_catalog_journey_graph(catalog):
+        """Prerequisite graph of one catalog"""
+        try:
+            return jsonify(app.catalogs.get(catalog).journey_map.get_course_graph_data())
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except Exception as e:
+            logger.error(f"Error getting graph for {catalog}: {e}")
+            count_error('route.get_catalog_journey_graph', e)
+            return jsonify({"error": "Failed to load map"}), 500
+
+    @app.route('/api/catalogs/<catalog>/journey/prerequisites/<int:course_id>', methods=['GET'])
+    @cached(version_fn=catalog_version)
+    def get_catalog_prerequisites(catalog, course_id):
+        """Prerequisite chain of a course within one catalog"""
+        try:
+            return jsonify(app.catalogs.get(catalog).journey_map.get_prerequisite_chain(course_id))
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except Exception as e:
+            logger.error(f"Error getting prerequisites for {catalog}: {e}")
+            count_error('route.get_catalog_prerequisites', e)
+            return jsonify({"error": "Failed to load prerequisites"}), 500
+
+    @app.route('/api/catalogs/<catalog>/journey/subgraph', methods=['GET'])
+    @cached(version_fn=catalog_version)
+    def get_catalog_subgraph(catalog):
+        """Merged chains of several courses within one catalog"""
+        try:
+            course_ids, direction, max_depth = parse_subgraph_args()
+            return jsonify(app.catalogs.get(catalog).journey_map.get_subgraph(course_ids, direction, max_depth))
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error getting subgraph for {catalog}: {e}")
+            count_error('route.get_catalog_subgraph', e)
+            return jsonify({"error": "Failed to load subgraph"}), 500
+
+    @app.route('/api/catalogs/<catalog>/journey/bottlenecks', methods=['GET'])
+    @cached(version_fn=catalog_version)
+    def get_catalog_bottlenecks(catalog):
+        """Courses of one catalog ranked by a precomputed curriculum metric"""
+        try:
+            metric = request.args.get('metric', 'bottleneck')
+            limit = min(request.args.get('limit', 10, type=int), 100)
+            return jsonify(app.catalogs.get(catalog).journey_map.get_bottlenecks(metric, limit))
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error ranking bottlenecks for {catalog}: {e}")
+            count_error('route.get_catalog_bottlenecks', e)
+            return jsonify({"error": "Failed to load analytics"}), 500
+
+    @app.route('/api/catalogs/<catalog>/recommendations/courses', methods=['GET'])
+    def recommend_catalog_courses(catalog):
+        """TF-IDF interest matching within one catalog"""
+        try:
+            interests = request.args.get('interests', '')
+            if not interests:
+                return jsonify({"error": "Interests required"}), 400
+            return jsonify(app.catalogs.get(catalog).recommender.recommend_courses(interests))
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except Exception as e:
+            logger.error(f"Error recommending for {catalog}: {e}")
+            count_error('route.recommend_catalog_courses', e)
             return jsonify({"error": "Recommender error"}), 500
 
+    @app.route('/api/catalogs/<catalog>/search', methods=['GET'])
+    def search_catalog(catalog):
+        """Retrieval-index search within one catalog"""
+        try:
+            query = request.args.get('q', '')
+            if not query:
+                return jsonify({"error": "Query required"}), 400
+            limit = min(request.args.get('limit', 10, type=int), 50)
+            results = app.catalogs.get(catalog).retriever.search(query, k=limit)
+            return jsonify({
+                "catalog": catalog,
+                "results": [
+                    {"id": c.id, "name": c.name, "snippet": c.snippet, "score": round(c.score, 4)}
+                    for c in results
+                ]
+            })
+        except UnknownCatalogError:
+            return unknown_catalog(catalog)
+        except Exception as e:
+            logger.error(f"Error searching {catalog}: {e}")
+            count_error('route.search_catalog', e)
+            return jsonify({"error": "Search error"}), 500
+
     @app.route('/health', methods=['GET'])
     def health_check():
         """Deployment status check"""
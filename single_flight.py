@@ -0,0 +1,169 @@
+"""
+Single Flight - Coalesces identical concurrent calls into one execution
+Within a worker, callers with the same key wait on the first caller's result.
+Across workers, an optional directory of lock files does the same: one
+process holds the flock and computes, the others wait and read its result.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; coalescing stays per-process
+    fcntl = None
+
+logger = logging.getLogger('single_flight')
+
+
+class SingleFlightTimeout(Exception):
+    """Raised when a waiter's deadline passes before the shared call finishes"""
+
+
+class SharedCallError(Exception):
+    """Raised in other workers when the call they were waiting on failed"""
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key among concurrent callers and share the outcome"""
+
+    SWEEP_EVERY = 50
+
+    def __init__(self, lock_dir=None, result_ttl=2.0, poll_interval=0.05):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, timeout=None):
+        """Return (result, shared). shared is True when another caller did the work.
+
+        Exceptions raised by fn reach every caller waiting on it. Waiters give
+        up with SingleFlightTimeout after `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise SingleFlightTimeout(f"Timed out waiting for shared call after {timeout}s")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            if self.lock_dir:
+                call.result, shared = self._do_across_workers(key, fn, deadline)
+            else:
+                call.result, shared = fn(), False
+            return call.result, shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def _do_across_workers(self, key, fn, deadline):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        lock_path = os.path.join(self.lock_dir, f"{digest}.lock")
+        result_path = os.path.join(self.lock_dir, f"{digest}.json")
+
+        # Another worker may have just finished the same call
+        outcome = self._read_result(result_path)
+        if outcome is not None:
+            return self._unwrap(outcome), True
+
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o600)
+        try:
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    waited = True
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise SingleFlightTimeout("Timed out waiting for another worker's call")
+                    time.sleep(self.poll_interval)
+
+            try:
+                if waited:
+                    outcome = self._read_result(result_path)
+                    if outcome is not None:
+                        return self._unwrap(outcome), True
+                try:
+                    result = fn()
+                except Exception as e:
+                    # Let waiting workers fail fast instead of repeating a failing call
+                    self._write_result(result_path, {'error': f"{type(e).__name__}: {e}"})
+                    raise
+                self._write_result(result_path, {'result': result})
+                return result, False
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _unwrap(outcome):
+        if 'error' in outcome:
+            raise SharedCallError(outcome['error'])
+        return outcome['result']
+
+    def _read_result(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, path, outcome):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(outcome, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not share call result: {e}")
+            return
+
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            self._sweep()
+
+    def _sweep(self):
+        """Remove result and lock files nobody has touched for a while"""
+        cutoff = time.time() - max(60, self.result_ttl * 10)
+        for name in os.listdir(self.lock_dir):
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -2,7 +2,9 @@
 Test script to verify AI Course Advisor setup
 """
 
+import os
 import sys
+import glob
 
 def test_imports():
     """Test that all required packages are installed"""
@@ -102,6 +104,758 @@ def test_recommender():
         print(f"❌ Recommender error: {e}")
         return False
 
+def test_retrieval():
+    """Test SVD retrieval ranking, topic boosts and an empty index"""
+    print("\nTesting retrieval engine...")
+    import tempfile
+    from types import SimpleNamespace
+    from recommender import CourseRecommender
+    from retrieval import RetrievalEngine
+
+    catalog = [
+        (1, "CS 4371: Computer System Security", "Security, cryptography, attacks and defenses."),
+        (2, "CS 4346: Artificial Intelligence", "Search, machine learning and neural networks."),
+        (3, "CS 3358: Data Structures", "Lists, trees, graphs, hashing and algorithm analysis."),
+        (4, "CS 4332: Machine Learning", "Supervised learning, neural networks and model evaluation."),
+    ]
+    with tempfile.TemporaryDirectory() as model_dir:
+        recommender = CourseRecommender()
+        recommender.model_path = f"{model_dir}/model.pkl"
+        assert recommender.train([
+            SimpleNamespace(id=i, name=name, description=desc, department="CS", level=4)
+            for i, name, desc in catalog
+        ])
+
+    empty = RetrievalEngine()
+    assert not empty.ready and empty.search("security") == [], "Unbuilt index returned results"
+    assert not empty.build(CourseRecommender()), "Untrained recommender was indexed"
+
+    engine = RetrievalEngine()
+    assert engine.build(recommender) and engine.ready
+    ranked = [c.id for c in engine.search("cryptography attacks", k=2)]
+    assert ranked[0] == 1, f"Security course not ranked first: {ranked}"
+
+    # A named course code outranks pure text similarity; a topic phrase nudges
+    boosted = engine.search("neural networks", k=4, boost_terms=["CS 3358"])
+    assert boosted[0].id == 3, f"Code boost not applied: {[c.id for c in boosted]}"
+    plain = {c.id: c.score for c in engine.search("neural networks", k=4)}
+    nudged = {c.id: c.score for c in engine.search("neural networks", k=4, boost_terms=["machine learning"])}
+    assert nudged[4] > plain[4] and nudged[2] == plain[2], "Topic boost hit the wrong courses"
+    assert engine.search("", k=3) == [], "Empty query returned results"
+
+    print("✅ Retrieval engine ranks and boosts courses")
+
+def test_resume_extractor():
+    """Test resume upload limits and per-document extraction processes"""
+    print("\nTesting resume extractor...")
+    import io
+    import pypdf
+    from flask import Flask
+    from resume_extractor import ResumeExtractor, ResumeExtractionError
+
+    config_app = Flask(__name__)
+    config_app.config['RESUME_MAX_BYTES'] = 1024
+    config_app.config['RESUME_EXTRACT_WORKERS'] = 0
+    extractor = ResumeExtractor(config_app)
+
+    for upload in (io.BytesIO(b"%PDF-" + b"x" * 2048), io.BytesIO(b"not a pdf")):
+        try:
+            extractor.extract(upload)
+        except ResumeExtractionError:
+            continue
+        assert False, "Oversized or non-PDF upload was accepted"
+
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=72, height=72)
+    pdf = io.BytesIO()
+    writer.write(pdf)
+
+    # A document that overruns its time is killed; the next one gets a fresh process
+    isolated = ResumeExtractor()
+    isolated.timeout = 0
+    try:
+        isolated.extract(io.BytesIO(pdf.getvalue()))
+        assert False, "Extraction past the timeout was not stopped"
+    except ResumeExtractionError:
+        pass
+    isolated.timeout = 30
+    assert isolated.extract(io.BytesIO(pdf.getvalue()))["pages"] == 1
+
+    print("✅ Resume extractor enforces upload limits and isolates documents")
+
+def test_result_cache():
+    """Test the resume result cache"""
+    print("\nTesting result cache...")
+    import time
+    import tempfile
+    from result_cache import ResultCache
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResultCache(max_entries=2, ttl=60, directory=cache_dir)
+        for key in ("a", "b", "c"):
+            cache.set(key, f"value-{key}")
+
+        # "a" fell out of memory but is still on disk
+        fresh = ResultCache(max_entries=2, ttl=60, directory=cache_dir)
+        assert fresh.get("a") == "value-a", "Entry lost from the disk tier"
+        assert len(cache._entries) == 2, "Memory tier over-retained entries"
+
+        expired = ResultCache(ttl=-1, directory=cache_dir)
+        expired.set("d", "value-d")
+        assert expired.get("d") is None, "Expired entry was returned"
+
+        # A disk hit keeps the writer's expiry rather than the reader's TTL
+        short = ResultCache(ttl=0.2, directory=cache_dir)
+        short.set("e", "value-e")
+        reader = ResultCache(ttl=3600, directory=cache_dir)
+        assert reader.get("e") == "value-e"
+        time.sleep(0.3)
+        assert reader.get("e") is None, "Disk hit was promoted with a fresh TTL"
+
+    print("✅ Result cache working")
+
+def test_text_utils():
+    """Test catalog HTML cleanup, snippets and token truncation"""
+    print("\nTesting text utilities...")
+    from text_utils import html_to_text, make_snippet, truncate_to_tokens
+    from models import Course
+
+    html = ('<p class="courseblockdesc">(3-0) Covers R&amp;D&nbsp;methods &lt;intro&gt;.'
+            '<script>track("x")</script><style>.a{color:red}</style> Prerequisite: '
+            '<a class="bubblelink code">CS&#160;1428</a>.</p>')
+    text = html_to_text(html)
+    assert text == "(3-0) Covers R&D methods <intro>. Prerequisite: CS 1428.", text
+    assert html_to_text("plain   words") == "plain words"
+
+    # Truncation backs off to the last whole word
+    assert truncate_to_tokens("alpha beta gamma delta", 5) == "alpha beta gamma"
+    first = "This course covers " + "core topics " * 12 + "in depth."
+    assert make_snippet(f"{first} {'More detail follows. ' * 10}") == first, "Snippet not cut at a sentence end"
+    assert make_snippet("one " * 200).endswith("one..."), "Snippet cut mid-word"
+
+    course = Course(name="CS 1428: Foundations")
+    course.set_description(html)
+    assert course.description == html and course.description_text == text
+    assert course.snippet.startswith("Covers R&D") and course.snippet_tokens > 0
+
+    print("✅ Text utilities working")
+
+def test_topic_matcher():
+    """Test catalog-derived topic extraction"""
+    print("\nTesting topic matcher...")
+    from types import SimpleNamespace
+    from topic_matcher import TopicMatcher
+
+    matcher = TopicMatcher().build([
+        SimpleNamespace(id=1, name="CS 3358: Data Structures and Algorithms"),
+        SimpleNamespace(id=2, name="CS 4346: Artificial Intelligence"),
+    ])
+    topics = matcher.match("Should I take cs3358 before AI? I maintain a data blog.")
+    assert topics[:2] == ["CS 3358", "artificial intelligence"], f"Unexpected topics: {topics}"
+    assert matcher.resolve_code("CS 4346") == 2, "Course code not resolved to its id"
+    assert not matcher.match("How do I maintain my grades in 2024?"), "Matched inside a word or a non-course number"
+
+    print(f"✅ Topic matcher working: {topics}")
+
+def test_conversation_memory():
+    """Test bounded per-user chat memory"""
+    print("\nTesting conversation memory...")
+    from conversation_memory import ConversationStore, InProcessSessionBackend
+
+    store = ConversationStore(InProcessSessionBackend(max_users=2), max_turns=3, token_budget=200)
+    for i in range(10):
+        store.record("alice", f"Question {i} about operating systems " * 5, f"Answer {i} " * 20)
+    store.record("bob", "Hi", "Hello")
+    store.record("carol", "Hi", "Hello")
+
+    assert store.get("alice") is None, "Least recently used user not evicted"
+    assert store.get("bob") is not None, "Recent user evicted"
+    assert store.get("web") is None, "Anonymous id got a session"
+
+    store.record("bob", "x " * 2000, "y " * 2000)
+    history = store.render(store.get("bob"))
+    assert len(store.get("bob")["turns"]) <= 3, "History exceeded its turn budget"
+    assert len(history) <= 200 * 4, f"History exceeded its token budget ({len(history)} chars)"
+
+    print("✅ Conversation memory working")
+
+def test_shared_session_writes():
+    """Test concurrent turns of one user are all kept in the shared SQLite store"""
+    print("\nTesting shared session writes...")
+    import tempfile
+    import threading
+    from conversation_memory import ConversationStore, SQLiteSessionBackend
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ConversationStore(SQLiteSessionBackend(f"{tmp}/sessions.db"), max_turns=100, token_budget=10000)
+
+        def chat(worker):
+            # Separate stores model separate gunicorn workers sharing the file
+            other = ConversationStore(SQLiteSessionBackend(f"{tmp}/sessions.db"), max_turns=100, token_budget=10000)
+            for i in range(15):
+                other.record("alice", f"q{worker}-{i}", "a")
+
+        threads = [threading.Thread(target=chat, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        turns = store.get("alice")["turns"]
+        assert len(turns) == 60, f"Lost turns under concurrency: kept {len(turns)} of 60"
+
+    print("✅ Concurrent session writes are atomic")
+
+def test_metrics():
+    """Test the Prometheus metrics endpoint, its access rule and cross-worker totals"""
+    print("\nTesting metrics...")
+    import json
+    import tempfile
+    from app import app
+    from metrics import MetricsRegistry, SharedMetrics
+
+    with app.test_client() as client:
+        client.get('/health')
+        response = client.get('/metrics')
+        body = response.get_data(as_text=True)
+        assert response.status_code == 200, f"Metrics endpoint failed: {response.status_code}"
+        assert 'http_request_duration_seconds_count{method="GET",route="/health"' in body
+        remote = client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.9'})
+        assert remote.status_code == 404, "Metrics served to a remote client without a token"
+
+    # Another worker's snapshot in the shared directory is summed into this one's
+    with tempfile.TemporaryDirectory() as shared_dir:
+        registries = []
+        for amount in (2, 3):
+            registry = MetricsRegistry()
+            registry.counter('jobs_total', 'Jobs').inc(amount, kind='resume')
+            registry.histogram('wait_seconds', 'Wait').observe(0.01 * amount)
+            registries.append(registry)
+        with open(os.path.join(shared_dir, '999999.json'), 'w') as f:
+            json.dump(registries[0].snapshot(), f)
+        body = SharedMetrics(registries[1], shared_dir).render()
+        assert 'jobs_total{kind="resume"} 5' in body, body
+        assert 'wait_seconds_count 2' in body, body
+
+    print("✅ Metrics endpoint working")
+
+def test_profiling():
+    """Test sampled profiles are written, listed, and stopped when a view raises"""
+    print("\nTesting request profiler...")
+    import tempfile
+    import threading
+    from flask import Flask
+    from profiling import RequestProfiler
+
+    with tempfile.TemporaryDirectory() as profile_dir:
+        profiled = Flask(__name__)
+        profiled.config.update(PROFILE_SAMPLE_RATE=1.0, PROFILE_DIR=profile_dir)
+        RequestProfiler(profiled)
+
+        @profiled.route('/ok')
+        def ok():
+            return 'ok'
+
+        @profiled.route('/boom')
+        def boom():
+            raise RuntimeError('boom')
+
+        with profiled.test_client() as client:
+            assert client.get('/ok').status_code == 200
+            # Propagated errors (debug/testing) skip after_request entirely
+            profiled.testing = True
+            try:
+                client.get('/boom')
+                assert False, "Error did not propagate"
+            except RuntimeError:
+                pass
+            listing = client.get('/debug/profiles').get_json()
+
+        assert not any(t.name == 'profile-sampler' for t in threading.enumerate()), "Sampler left running"
+        statuses = sorted(p['status'] for p in listing['profiles'])
+        assert statuses == [200, 500], f"Unexpected profiles: {listing}"
+        assert all(os.path.exists(os.path.join(profile_dir, p['profile_file'])) for p in listing['profiles'])
+
+    # With a token, only the header forces a profile or opens the listing
+    with tempfile.TemporaryDirectory() as profile_dir:
+        guarded = Flask(__name__)
+        guarded.config.update(PROFILE_SAMPLE_RATE=0.0, PROFILE_DIR=profile_dir, PROFILE_TOKEN='s3cret')
+        RequestProfiler(guarded)
+        guarded.add_url_rule('/ok', 'ok', lambda: 'ok')
+
+        with guarded.test_client() as client:
+            assert client.get('/ok', headers={'X-Profile': 'sécret'}).status_code == 200, \
+                "Non-ASCII token broke the request"
+            assert client.get('/ok', headers={'X-Profile': 's3cret'}).status_code == 200
+            assert client.get('/debug/profiles', headers={'X-Profile': 'sécret'}).status_code == 404
+            assert client.get('/debug/profiles?token=s3cret').status_code == 404, "Query-string token accepted"
+            listing = client.get('/debug/profiles', headers={'X-Profile': 's3cret'}).get_json()
+        assert len(listing['profiles']) == 1, f"Expected only the forced profile: {listing}"
+
+    print("✅ Request profiler working")
+
+def test_response_cache():
+    """Test compression and conditional requests on cached routes"""
+    print("\nTesting response cache...")
+    import gzip
+    from app import app
+
+    with app.test_client() as client:
+        plain = client.get('/')
+        compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        revalidated = client.get('/', headers={'If-None-Match': plain.headers['ETag']})
+
+    assert compressed.headers.get('Content-Encoding') == 'gzip', "Compressed body missing"
+    assert gzip.decompress(compressed.data) == plain.data, "Compressed body differs from the plain one"
+    assert revalidated.status_code == 304, f"Conditional request returned {revalidated.status_code}"
+
+    print(f"✅ Response cache working ({len(plain.data)} -> {len(compressed.data)} bytes)")
+
+def test_single_flight():
+    """Test that concurrent identical calls share one execution, within and across workers"""
+    print("\nTesting single-flight coalescing...")
+    import time
+    import tempfile
+    import threading
+    from single_flight import SingleFlight
+
+    calls = []
+    def slow_answer():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"message": "shared"}
+
+    def burst(groups):
+        results = []
+        threads = [
+            threading.Thread(target=lambda g=g: results.append(g.do('same question', slow_answer, timeout=5)))
+            for g in groups
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    results = burst([SingleFlight()] * 5)
+    assert len(calls) == 1, f"In-process burst made {len(calls)} calls"
+    assert sum(shared for _, shared in results) == 4, f"Unexpected shared flags: {results}"
+
+    # Two groups over one lock directory stand in for two worker processes
+    calls.clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        burst([SingleFlight(lock_dir=tmp), SingleFlight(lock_dir=tmp)])
+    assert len(calls) == 1, f"Cross-worker burst made {len(calls)} calls"
+
+    group = SingleFlight()
+    def failing():
+        time.sleep(0.1)
+        raise RuntimeError("upstream down")
+    errors = []
+    def ask():
+        try:
+            group.do('broken', failing, timeout=5)
+        except RuntimeError as e:
+            errors.append(e)
+    threads = [threading.Thread(target=ask) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 3, f"Error reached {len(errors)} of 3 waiters"
+
+    print("✅ Single-flight coalescing working")
+
+def test_catalogs():
+    """Test that catalog namespaces get their own lazily loaded graph and indexes"""
+    print("\nTesting catalog namespaces...")
+    from app import app, db
+    from models import Course, CoursePrerequisite
+    try:
+        with app.app_context():
+            intro = Course(catalog='test-math', name='MATH 1315: College Algebra', department='MATH', level=1)
+            intro.set_description('<p class="courseblockdesc">(3-0) Functions, equations and graphs.</p>')
+            calc = Course(catalog='test-math', name='MATH 2471: Calculus I', department='MATH', level=2)
+            calc.set_description('<p class="courseblockdesc">(4-0) Limits, derivatives and integrals.</p>')
+            db.session.add_all([intro, calc])
+            db.session.flush()
+            db.session.add(CoursePrerequisite(course_id=calc.id, prerequisite_id=intro.id))
+            db.session.commit()
+
+        with app.test_client() as client:
+            graph = client.get('/api/catalogs/test-math/journey/graph').get_json()
+            search = client.get('/api/catalogs/test-math/search?q=derivatives').get_json()
+            missing = client.get('/api/catalogs/no-such-catalog/journey/graph')
+
+        assert {n['department'] for n in graph['nodes']} == {'MATH'} and len(graph['links']) == 1, \
+            f"Catalog graph is not scoped to its namespace: {graph}"
+        assert search['results'] and 'Calculus' in search['results'][0]['name'], \
+            f"Catalog search did not use the catalog's index: {search}"
+        assert missing.status_code == 404, f"Unknown catalog returned {missing.status_code}"
+
+        # Over budget: everything but the default catalog is evicted on the next load
+        budget = app.catalogs.memory_budget
+        app.catalogs.memory_budget = 0
+        try:
+            app.catalogs.invalidate('test-math')
+            app.catalogs.get('test-math')
+            loaded_alone = app.catalogs.stats()['loaded']
+        finally:
+            app.catalogs.memory_budget = budget
+        assert loaded_alone == 2, f"Expected default + requested catalog loaded, got {loaded_alone}"
+
+        print("✅ Catalog namespaces working")
+    finally:
+        with app.app_context():
+            ids = db.select(Course.id).where(Course.catalog == 'test-math')
+            CoursePrerequisite.query.filter(CoursePrerequisite.course_id.in_(ids)).delete(synchronize_session=False)
+            Course.query.filter_by(catalog='test-math').delete(synchronize_session=False)
+            db.session.commit()
+        app.catalogs.invalidate('test-math')
+        for path in glob.glob(os.path.join(app.catalogs.model_dir, 'catalogs', 'test-math-*.pkl')):
+            os.remove(path)
+
+def test_catalog_refresh():
+    """Test that running processes pick up catalogs re-imported elsewhere"""
+    print("\nTesting catalog refresh...")
+    import tempfile
+    from app import app, db
+    from models import Course, CatalogRevision, bump_catalog_revision
+    default = app.config['DEFAULT_CATALOG']
+    model_dir = app.catalogs.model_dir
+    with app.app_context():
+        saved = db.session.get(CatalogRevision, default)
+        default_revision = (saved.revision, saved.updated_at) if saved is not None else None
+
+    # Rebuilt catalogs retrain into a scratch directory, never over the real models
+    with tempfile.TemporaryDirectory() as scratch:
+        app.catalogs.model_dir = scratch
+        try:
+            with app.app_context():
+                course = Course(catalog='test-refresh', name='PHIL 1305: Philosophy and Critical Thinking',
+                                department='PHIL', level=1)
+                course.set_description('<p class="courseblockdesc">(3-0) Arguments and reasoning.</p>')
+                db.session.add(course)
+                bump_catalog_revision('test-refresh')
+                db.session.commit()
+
+            with app.test_client() as client:
+                before = client.get('/api/catalogs/test-refresh/courses').get_json()
+                assert before['count'] == 1, f"Expected 1 course before the import, got {before['count']}"
+                old_version = app.catalogs.version('test-refresh')
+
+                # What course_importer does from another process: write, bump, commit
+                with app.app_context():
+                    course = Course(catalog='test-refresh', name='PHIL 2330: Ethics', department='PHIL', level=2)
+                    course.set_description('<p class="courseblockdesc">(3-0) Moral theories.</p>')
+                    db.session.add(course)
+                    bump_catalog_revision('test-refresh')
+                    db.session.commit()
+
+                assert 'test-refresh' in app.catalogs.refresh(force=True), "Revision bump was not noticed"
+                assert app.catalogs.version('test-refresh') != old_version, "Catalog version did not change"
+                after = client.get('/api/catalogs/test-refresh/courses').get_json()
+                assert after['count'] == 2, f"Cached course list is stale: {after['count']} courses"
+                assert app.catalogs.refresh(force=True) == [], "Unchanged catalogs were rebuilt"
+
+                # The default catalog also re-points the unscoped routes and the advisor
+                journey_map = app.journey_map
+                with app.app_context():
+                    bump_catalog_revision(default)
+                    db.session.commit()
+                assert default in app.catalogs.refresh(force=True), "Default catalog was not rebuilt"
+                assert app.journey_map is not journey_map, "Unscoped routes still use the old graph"
+                assert app.advisor.journey_map is app.journey_map, "Advisor still uses the old graph"
+                assert client.get('/api/courses').status_code == 200
+
+            print("✅ Catalog refresh working")
+        finally:
+            with app.app_context():
+                Course.query.filter_by(catalog='test-refresh').delete(synchronize_session=False)
+                CatalogRevision.query.filter_by(catalog='test-refresh').delete(synchronize_session=False)
+                # Put the default catalog's revision back, then resync the loaded bundle with it
+                if default_revision is None:
+                    CatalogRevision.query.filter_by(catalog=default).delete(synchronize_session=False)
+                else:
+                    row = db.session.get(CatalogRevision, default)
+                    row.revision, row.updated_at = default_revision
+                db.session.commit()
+            app.catalogs.invalidate('test-refresh')
+            app.catalogs.refresh(force=True)
+            app.catalogs.model_dir = model_dir
+            app.recommender.model_path = os.path.join(model_dir, 'recommender_model.pkl')
+
+def test_job_queue():
+    """Test job retries, results, lease expiry and attachment cleanup in the background queue"""
+    print("\nTesting job queue...")
+    import time
+    import tempfile
+    from flask import Flask
+    from job_queue import JobQueue, PermanentJobError, LEASE_EXPIRED_ERROR
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__, instance_path=tmp)
+        app.config.update(JOB_WORKERS=0, JOB_RETRY_DELAY=0, JOB_MAX_ATTEMPTS=3)
+        queue = JobQueue(app)
+
+        attempts = []
+        def flaky(payload, attachment_path):
+            attempts.append(attachment_path)
+            if len(attempts) == 1:
+                raise ConnectionError("upstream timeout")
+            with open(attachment_path, 'rb') as f:
+                return {"echo": payload["word"], "bytes": len(f.read())}
+        def broken(payload, attachment_path):
+            raise PermanentJobError("bad input")
+        queue.register('flaky', flaky)
+        queue.register('broken', broken)
+
+        ok_id = queue.enqueue('flaky', {"word": "hello"}, attachment=b"%PDF-1.4 test")
+        bad_id = queue.enqueue('broken', {})
+        while queue.run_once():
+            pass
+
+        ok, bad = queue.get(ok_id), queue.get(bad_id)
+        assert ok['status'] == 'succeeded' and ok['attempts'] == 2, f"Retried job ended as {ok}"
+        assert ok['result'] == {"echo": "hello", "bytes": 13}, f"Unexpected result {ok}"
+        assert bad['status'] == 'failed' and bad['attempts'] == 1, f"Permanent failure was retried: {bad}"
+        assert not os.listdir(queue.directory), "Attachments not cleaned up"
+
+        # Workers that died mid-job: reclaimed while attempts remain, failed once they run out
+        queue.register('crashy', lambda payload, attachment_path: "recovered")
+        dead_id = queue.enqueue('crashy', {}, attachment=b"data")
+        retry_id = queue.enqueue('crashy', {})
+        expired = time.time() - 1
+        queue._connect().execute(
+            "UPDATE jobs SET status = 'running', attempts = max_attempts, lease_until = ? WHERE id = ?",
+            (expired, dead_id)
+        )
+        queue._connect().execute(
+            "UPDATE jobs SET status = 'running', attempts = 1, lease_until = ? WHERE id = ?", (expired, retry_id)
+        )
+        while queue.run_once():
+            pass
+        dead, retried = queue.get(dead_id), queue.get(retry_id)
+        assert dead['status'] == 'failed' and dead['error'] == LEASE_EXPIRED_ERROR, f"Expired job retried: {dead}"
+        assert dead['attempts'] == 3, f"Expired job ran again: {dead}"
+        assert retried['status'] == 'succeeded' and retried['attempts'] == 2, f"Expired lease not reclaimed: {retried}"
+        assert not os.listdir(queue.directory), "Attachment of the failed job not cleaned up"
+
+        # Importing the app (scripts, tests) never claims jobs; a serving process
+        # drains jobs queued by one that went away, without enqueuing anything itself
+        orphan_id = queue.enqueue('crashy', {})
+        other = Flask(__name__, instance_path=tmp)
+        other.config.update(JOB_WORKERS=1)
+        worker = JobQueue(other)
+        assert not worker._threads, "Workers started on import"
+        worker.poll_interval = 0.05
+        worker.register('crashy', lambda payload, attachment_path: "picked up")
+        worker.start()
+        try:
+            deadline = time.time() + 5
+            while queue.get(orphan_id)['status'] != 'succeeded' and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            worker.stop()
+        assert queue.get(orphan_id)['result'] == "picked up", f"Orphaned job not run: {queue.get(orphan_id)}"
+
+    print("✅ Job queue working")
+
+def test_curriculum_analytics():
+    """Test unlock counts, depths and bottleneck scores, including a prerequisite cycle"""
+    print("\nTesting curriculum analytics...")
+    import networkx as nx
+    from curriculum_analytics import CurriculumAnalytics
+
+    graph = nx.DiGraph()
+    for course_id, level in [(1, 1), (2, 1), (3, 2), (4, 3), (5, 4), (6, 2), (7, 2)]:
+        graph.add_node(course_id, level=level)
+    # 1,2 -> 3 -> 4 -> 5, plus a catalog error: 6 <-> 7 after 1
+    graph.add_edges_from([(1, 3), (2, 3), (3, 4), (4, 5), (1, 6), (6, 7), (7, 6)])
+    analytics = CurriculumAnalytics.compute(graph)
+
+    intro, gateway, cyclic = analytics.for_course(1), analytics.for_course(3), analytics.for_course(6)
+    assert (intro['unlock_count'], intro['path_to_senior'], gateway['depth']) == (5, 3, 1), \
+        f"Unexpected metrics: {intro}, {gateway}"
+    assert cyclic['unlock_count'] == 1 and cyclic['path_to_senior'] == -1, f"Cycle not collapsed: {cyclic}"
+    # Every path starts at 1; 3 carries 2 of the 3 paths and outranks 4 and 5 on unlocks
+    assert [course_id for course_id, _ in analytics.ranked('bottleneck', 2)] == [1, 3], \
+        f"Unexpected bottleneck ranking: {analytics.ranked('bottleneck', 4)}"
+
+    print("✅ Curriculum analytics working")
+
+def test_journey_subgraph():
+    """Test batched prerequisite/unlock queries merge and deduplicate chains"""
+    print("\nTesting journey subgraph queries...")
+    import networkx as nx
+    from journey_map import JourneyMap
+
+    journey = JourneyMap()
+    journey.course_graph = nx.DiGraph([(1, 3), (2, 3), (3, 4), (4, 5), (3, 6)])
+    for node in journey.course_graph:
+        journey.course_graph.nodes[node]['name'] = f"CS {node}"
+
+    both = journey.get_subgraph([4, 6, 99], direction='prerequisites')
+    assert sorted(n['id'] for n in both['nodes']) == [1, 2, 3, 4, 6] and len(both['links']) == 4, \
+        f"Merged prerequisite chains wrong: {both}"
+    assert both['missing'] == [99], f"Unknown course ids not reported: {both['missing']}"
+
+    near = journey.get_subgraph([3], direction='both', max_depth=1)
+    assert sorted(n['id'] for n in near['nodes']) == [1, 2, 3, 4, 6], f"Depth limit not applied: {near}"
+
+    print("✅ Journey subgraph queries working")
+
+def test_intent_router():
+    """Test factual catalog questions are answered without the LLM, and nothing else is"""
+    print("\nTesting intent router...")
+    from types import SimpleNamespace
+    import networkx as nx
+    import intent_router
+    from ai_advisor import AIAdvisor
+    from journey_map import JourneyMap
+    from curriculum_analytics import CurriculumAnalytics
+    from topic_matcher import TopicMatcher
+
+    names = {1: "CS 1428: Foundations", 2: "CS 2308: Foundations II", 3: "CS 3358: Data Structures",
+             4: "CS 4380: Compilers"}
+    matcher = TopicMatcher().build([SimpleNamespace(id=i, name=n) for i, n in names.items()])
+    expected = {
+        "What are the prerequisites for CS 3358?": intent_router.PREREQUISITES,
+        "What do I need before taking CS 3358?": intent_router.PREREQUISITES,
+        "Does CS 3358 have any prereqs?": intent_router.PREREQUISITES,
+        "What are prerequisites for CS 4380?": intent_router.PREREQUISITES,
+        "What are prereqs for CS 3358?": intent_router.PREREQUISITES,
+        "Which are prerequisites for CS 3358?": intent_router.PREREQUISITES,
+        "What is needed for CS 3358?": intent_router.PREREQUISITES,
+        "What does CS 1428 unlock?": intent_router.UNLOCKS,
+        "What is CS 1428 a prerequisite for?": intent_router.UNLOCKS,
+        "Is CS 1428 a prerequisite for CS 3358?": intent_router.UNLOCKS,
+        "What is CS 1428 required for?": intent_router.UNLOCKS,
+        "What is CS 3358?": intent_router.LOOKUP,
+        "How many credits is CS 3358?": intent_router.LOOKUP,
+        "What's the description of CS 4380?": intent_router.LOOKUP,
+        # Open-ended questions that merely name a course go to the LLM
+        "Should I take CS 3358 next semester?": None,
+        "What is the workload for CS 3358?": None,
+        "What is the grading policy in CS 4380?": None,
+        "What is CS 3358 like?": None,
+        "Does CS 3358 require a lot of math?": None,
+        "I failed CS 2308, what is required now?": None,
+    }
+    for question, kind in expected.items():
+        intent = intent_router.classify(question, matcher)
+        assert getattr(intent, 'kind', None) == kind, f"{question!r} routed to {intent}, expected {kind}"
+
+    advisor = AIAdvisor()
+    advisor.client = None
+    advisor.topic_matcher = matcher
+    advisor.journey_map = JourneyMap()
+    graph = nx.DiGraph([(1, 2), (2, 3)])
+    for course_id, name in names.items():
+        graph.add_node(course_id, name=name, description="", level=course_id)
+    advisor.journey_map.course_graph = graph
+    advisor.journey_map.analytics = CurriculumAnalytics.compute(graph)
+
+    answer = advisor.get_response('student', "What are the prerequisites for CS 3358?")
+    assert "requires CS 2308" in answer['message'] and [c['id'] for c in answer['courses']] == [2], \
+        f"Prerequisite answer wrong: {answer}"
+    follow_up = advisor.get_response('student', "And what does it unlock?")
+    assert "not a prerequisite" in follow_up['message'], f"Follow-up did not reuse the last course: {follow_up}"
+
+    print("✅ Intent router working")
+
+def test_database_backend():
+    """Test database URL/pool configuration and the per-backend setup of the
+    configured database; with TEST_DATABASE_URL, also a pooled round trip"""
+    print("\nTesting database backend...")
+    from sqlalchemy import create_engine, inspect, text
+    from app import app
+    from extensions import db, normalize_database_url, engine_options
+
+    assert normalize_database_url("postgres://u:p@host/db") == "postgresql+psycopg2://u:p@host/db", \
+        "postgres:// URL not pinned to psycopg2"
+    assert normalize_database_url("postgresql://host/db") == "postgresql+psycopg2://host/db", \
+        "postgresql:// URL not pinned to psycopg2"
+    assert normalize_database_url("sqlite:///x.db") == "sqlite:///x.db", "SQLite URL changed"
+    options = engine_options({'SQLALCHEMY_DATABASE_URI': "postgresql+psycopg2://host/db", 'DB_POOL_SIZE': 3})
+    assert options.get('pool_size') == 3 and options.get('pool_pre_ping'), f"Unexpected pool options: {options}"
+    assert engine_options({'SQLALCHEMY_DATABASE_URI': "sqlite:///x.db"}) == {}, "SQLite given pool options"
+
+    with app.app_context():
+        tables = set(inspect(db.engine).get_table_names())
+        assert {'courses', 'course_prerequisites', 'catalog_revisions'} <= tables, f"create_all missed tables: {tables}"
+        if db.engine.dialect.name == 'sqlite':
+            mode = db.session.execute(text("PRAGMA journal_mode")).scalar()
+            timeout = db.session.execute(text("PRAGMA busy_timeout")).scalar()
+            assert mode == 'wal' and timeout == app.config['SQLITE_BUSY_TIMEOUT_MS'], \
+                f"SQLite profile not applied: journal_mode={mode}, busy_timeout={timeout}"
+        else:
+            pool = db.engine.pool
+            assert pool.size() == app.config['DB_POOL_SIZE'], f"Pool not configured: {pool.status()}"
+            assert db.session.execute(text("SELECT COUNT(*) FROM courses")).scalar() is not None
+
+    server_url = os.environ.get('TEST_DATABASE_URL')
+    if server_url:
+        url = normalize_database_url(server_url)
+        engine = create_engine(url, **engine_options({'SQLALCHEMY_DATABASE_URI': url}))
+        db.metadata.create_all(engine)
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT COUNT(*) FROM course_prerequisites")).scalar()
+        engine.dispose()
+        print(f"✅ Server database reachable ({rows} prerequisite rows)")
+
+    print(f"✅ Database backend configured ({app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]})")
+
+def test_preload_fork():
+    """Test that workers forked from a preloaded master open their own
+    connections and that importing the app does not create the Gemini client"""
+    print("\nTesting preload and fork...")
+    import json
+    import tempfile
+    import subprocess
+    from flask import Flask
+    from conversation_memory import SQLiteSessionBackend
+    from job_queue import JobQueue
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The master opens connections while building the app...
+        sessions = SQLiteSessionBackend(f"{tmp}/sessions.db")
+        app = Flask(__name__, instance_path=tmp)
+        app.config.update(JOB_WORKERS=0)
+        queue = JobQueue(app)
+        inherited = (id(sessions._connect()), id(queue._connect()))
+
+        # ...then forks a worker, which must not reuse them
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                own = (id(sessions._connect()), id(queue._connect()))
+                sessions.save('student', {'turns': [], 'topics': ['CS 3358']})
+                report = {'own': [a != b for a, b in zip(own, inherited)], 'saved': sessions.load('student')}
+                os.write(write_fd, json.dumps(report).encode('utf-8'))
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            report = json.loads(f.read() or '{}')
+        os.waitpid(pid, 0)
+
+        assert report.get('own') == [True, True], f"Worker reused the master's connections: {report}"
+        assert report['saved']['topics'] == ['CS 3358'], f"Worker could not use its connection: {report}"
+        assert sessions.load('student')['topics'] == ['CS 3358'], "Worker's write not visible to the master"
+        assert (id(sessions._connect()), id(queue._connect())) == inherited, "Master lost its connections"
+
+    # The Gemini client (and its HTTP pool) is created lazily in each worker, never at import
+    probe = subprocess.run(
+        [sys.executable, '-c',
+         "import sys, app; print(app.app.advisor._client_pid is None, 'google.genai' in sys.modules)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, timeout=120,
+        env={**os.environ, 'GOOGLE_API_KEY': 'test-key'}
+    )
+    assert probe.stdout.split()[-2:] == ['True', 'False'], f"Client created at import: {probe.stdout[-200:]}"
+
+    print("✅ Preloaded workers get their own connections")
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -112,12 +866,36 @@ def main():
         test_imports,
         test_database,
         test_api,
-        test_recommender
+        test_recommender,
+        test_retrieval,
+        test_resume_extractor,
+        test_result_cache,
+        test_text_utils,
+        test_topic_matcher,
+        test_conversation_memory,
+        test_shared_session_writes,
+        test_preload_fork,
+        test_metrics,
+        test_profiling,
+        test_response_cache,
+        test_single_flight,
+        test_catalogs,
+        test_catalog_refresh,
+        test_job_queue,
+        test_curriculum_analytics,
+        test_journey_subgraph,
+        test_intent_router,
+        test_database_backend
     ]
     
     results = []
     for test in tests:
-        results.append(test())
+        # Older checks return True/False; newer ones assert and return None
+        try:
+            results.append(test() is not False)
+        except Exception as e:
+            print(f"❌ {test.__name__}: {type(e).__name__}: {e}")
+            results.append(False)
         print()
     
     print("=" * 60)
@@ -0,0 +1,74 @@
+"""
+Text helpers shared by the advisor pipeline (token budgeting, truncation, cleanup)
+"""
+
+import re
+
+from bs4 import BeautifulSoup
+
+# Gemini tokenizes English prose at roughly four characters per token.
+# A character-based estimate is cheap and close enough for budgeting prompts.
+CHARS_PER_TOKEN = 4
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def estimate_tokens(text):
+    """Approximate the number of LLM tokens in a piece of text"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def normalize_whitespace(text):
+    """Collapse runs of whitespace into single spaces"""
+    return _WHITESPACE_RE.sub(' ', text or '').strip()
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to fit a token budget, preferring a word boundary"""
+    if not text or max_tokens <= 0:
+        return ''
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(' ')
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip()
+
+
+# Catalog prose opens with the credit-hour split, e.g. "(3-0) This course..."
+_CREDIT_HOURS_RE = re.compile(r'^\(\d+-\d+\)\s*')
+_SENTENCE_END_RE = re.compile(r'[.!?](?=\s|$)')
+
+SNIPPET_TOKENS = 48
+
+
+def html_to_text(html):
+    """Strip markup from catalog HTML, leaving readable plain text"""
+    if not html:
+        return ''
+    if '<' not in html and '&' not in html:
+        return normalize_whitespace(html)
+    soup = BeautifulSoup(html, 'html.parser')
+    # Code and CSS are not prose; get_text() would keep their contents
+    for tag in soup(['script', 'style']):
+        tag.decompose()
+    return normalize_whitespace(soup.get_text().replace('\xa0', ' '))
+
+
+def make_snippet(text, max_tokens=SNIPPET_TOKENS):
+    """Short, prompt-ready summary of a plain-text description.
+
+    Prefers ending on a sentence boundary so the model never sees half a word.
+    """
+    text = _CREDIT_HOURS_RE.sub('', normalize_whitespace(text))
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = truncate_to_tokens(text, max_tokens)
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut)]
+    if ends and ends[-1] > len(cut) // 2:
+        return cut[:ends[-1]]
+    return cut + '...'
@@ -0,0 +1,170 @@
+"""
+Topic Matcher - Catalog-derived vocabulary for finding course topics in text
+Phrases are compiled into a token trie so a message is scanned once, on word
+boundaries, instead of substring-searching for each keyword.
+"""
+
+import re
+import logging
+
+logger = logging.getLogger('topic_matcher')
+
+# Hand-picked synonyms students use that don't appear verbatim in course titles.
+# Maps the phrase as typed to the term used to search the catalog.
+CURATED_ALIASES = {
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "machine learning": "machine learning",
+    "deep learning": "machine learning",
+    "data science": "data",
+    "data": "data",
+    "db": "database",
+    "dbms": "database",
+    "databases": "database",
+    "sql": "database",
+    "security": "security",
+    "cybersecurity": "security",
+    "cyber security": "security",
+    "web": "web",
+    "web development": "web",
+    "cloud": "cloud",
+    "networking": "network",
+    "networks": "network",
+    "os": "operating systems",
+    "python": "python",
+    "java": "java",
+    "c++": "c++",
+    "coding": "programming",
+    "programming": "programming",
+    "software": "software",
+    "algorithms": "algorithms",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "as", "at", "by", "for", "from", "in", "into", "of", "on",
+    "or", "the", "to", "with", "i", "ii", "iii", "iv",
+}
+
+# Title words too generic to be useful retrieval keys on their own
+GENERIC_WORDS = {
+    "introduction", "intro", "topics", "special", "selected", "advanced",
+    "fundamentals", "foundations", "principles", "seminar", "independent",
+    "study", "studies", "problems", "project", "projects", "course", "honors",
+    "internship", "thesis", "science", "computer", "systems", "applied",
+}
+
+MAX_NGRAM = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+[+#]*")
+_CODE_RE = re.compile(r"\b([A-Za-z]{2,4})\s?-?(\d{4}[A-Za-z]?)\b")
+_NAME_CODE_RE = re.compile(r"^\s*([A-Za-z]{2,4})\s+(\d+[A-Za-z]?)\s*:?\s*(.*)$")
+
+_TERMINAL = None  # trie key marking the end of a phrase
+
+
+def normalize_code(dept, number):
+    """Canonical course code, e.g. ('cs', '4380') -> 'CS 4380'"""
+    return f"{dept.upper()} {number.upper()}"
+
+
+class TopicMatcher:
+    """Finds course codes and catalog topics in free text"""
+
+    def __init__(self):
+        self.code_index = {}
+        self.departments = {"CS"}
+        self._trie = {}
+        self._phrase_count = 0
+
+    def build(self, courses, aliases=None):
+        """Compile the vocabulary from course rows plus curated aliases"""
+        trie = {}
+        code_index = {}
+        departments = set()
+        count = 0
+
+        for course in courses:
+            match = _NAME_CODE_RE.match(course.name or "")
+            if match:
+                dept, number, title = match.groups()
+                code_index[normalize_code(dept, number)] = course.id
+                departments.add(dept.upper())
+            else:
+                title = course.name or ""
+
+            for phrase in self._title_ngrams(title):
+                count += self._insert(trie, phrase.split(), phrase)
+
+        for phrase, term in (CURATED_ALIASES if aliases is None else aliases).items():
+            count += self._insert(trie, _TOKEN_RE.findall(phrase.lower()), term, overwrite=True)
+
+        self._trie = trie
+        self.code_index = code_index
+        self.departments = departments or {"CS"}
+        self._phrase_count = count
+        logger.info(f"Topic matcher built: {len(code_index)} course codes, {count} phrases")
+        return self
+
+    def match(self, text):
+        """Return search terms found in text: course codes first, then topics
+        from most to least specific. Runs in one pass over the tokens."""
+        if not text:
+            return []
+
+        codes = []
+        for dept, number in _CODE_RE.findall(text):
+            if dept.upper() in self.departments:
+                code = normalize_code(dept, number)
+                if code not in codes:
+                    codes.append(code)
+
+        tokens = _TOKEN_RE.findall(text.lower())
+        found = {}
+        i = 0
+        while i < len(tokens):
+            node = self._trie
+            best_term, best_len = None, 0
+            for j in range(i, min(i + MAX_NGRAM, len(tokens))):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if _TERMINAL in node:
+                    best_term, best_len = node[_TERMINAL], j - i + 1
+            if best_term is None:
+                i += 1
+                continue
+            if best_term not in found or found[best_term][0] < best_len:
+                found[best_term] = (best_len, i)
+            i += best_len
+
+        topics = sorted(found, key=lambda term: (-found[term][0], found[term][1]))
+        return codes + topics
+
+    def resolve_code(self, code):
+        """Course id for a canonical code like 'CS 4380', or None"""
+        return self.code_index.get(code)
+
+    @staticmethod
+    def _title_ngrams(title):
+        words = _TOKEN_RE.findall(title.lower())
+        for n in range(1, MAX_NGRAM + 1):
+            for start in range(len(words) - n + 1):
+                gram = words[start:start + n]
+                if gram[0] in STOPWORDS or gram[-1] in STOPWORDS:
+                    continue
+                if n == 1 and (len(gram[0]) < 3 or gram[0] in GENERIC_WORDS or gram[0].isdigit()):
+                    continue
+                yield " ".join(gram)
+
+    @staticmethod
+    def _insert(trie, tokens, term, overwrite=False):
+        if not tokens or len(tokens) > MAX_NGRAM:
+            return 0
+        node = trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if _TERMINAL in node and not overwrite:
+            return 0
+        added = 0 if _TERMINAL in node else 1
+        node[_TERMINAL] = term
+        return added